@@ -1,19 +1,14 @@
 # -*- coding: utf-8 -*-
 import time
-import i18n
-from dashcoch import DataLoader, StyleLoader
-import math
+from dashcoch import DataRefresher, FigureCache, Metrics, StyleLoader, geometry, serialization
 from configparser import ConfigParser
-from datetime import date, datetime, timedelta
+from datetime import datetime
 from pytz import timezone
-import geojson
 import dash
-import dash_table
+import flask
 import dash_core_components as dcc
 import dash_html_components as html
-from dash.dependencies import Input, Output, ClientsideFunction
-import pandas as pd
-from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from dash.dependencies import Input, Output, State, ClientsideFunction
 
 #external_stylesheets = ["https://codepen.io/chriddyp/pen/bWLwgP.css"]
 parser = ConfigParser()
@@ -49,22 +44,81 @@ app.scripts.append_script({
     'external_url': 'http://dashcoch-at.herokuapp.com/assets/gtag.js'
 })
 
+refresher = DataRefresher(
+    parser,
+    interval=parser.getfloat("data", "refresh_interval", fallback=60),
+    lazy=parser.getboolean("data", "lazy", fallback=False),
+    shared_directory=parser.get("shared", "directory", fallback="") or None,
+)
+refresher.start()
+
+
 def get_data():
-    global data
-    data = DataLoader(parser)
-    
-get_data()
+    # Callbacks take one snapshot and use it throughout
+    return refresher.current
+
+
+# The map is drawn from the simplified geometry for its height of 600 px,
+# falling back to the full resolution file
+geometry_directory = parser.get("geometry", "directory", fallback=".cache/geometry")
+try:
+    map_geometry = "/geometry/" + geometry.pick(
+        geometry.load(
+            parser.get("geometry", "source", fallback="assets/austria.geojson"),
+            geometry_directory,
+        ),
+        600,
+    )
+except (OSError, ValueError) as e:
+    print("Building the map geometry failed: {}".format(e))
+    map_geometry = "/assets/austria.geojson"
+
+
+@server.route("/geometry/<name>")
+def serve_geometry(name):
+    # File names contain a hash of their content, so they can be cached forever
+    file_name, encoding = geometry.negotiate(
+        geometry_directory, name, flask.request.headers.get("Accept-Encoding", "")
+    )
+    response = flask.send_from_directory(
+        geometry_directory, file_name, mimetype="application/json"
+    )
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    response.headers["Vary"] = "Accept-Encoding"
+    response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    return response
+
 
 app.title = "COVID19 Tracker Austria"
 
 #
 # Show the data
 #
+def deferred_section(section, *children):
+    """A section whose figures (see deferred_figures) are loaded when it is
+    first visible: the browser then clicks its hidden trigger."""
+    return html.Div(
+        id=section,
+        children=list(children)
+        + [
+            html.Div(id=section + "-trigger", n_clicks=0, hidden=True),
+            dcc.Store(id=section + "-visible"),
+        ]
+        + [dcc.Store(id=graph + "-base") for graph in deferred_figures[section]],
+    )
+
+
+# The stores and the figures that do not depend on the controls are filled
+# in here, so the layout, which is built once per dataset, holds the default
+# view, and loading the page does not hit the server again. Callbacks only run
+# when the controls change, in the browser. The sections far below the fold
+# are left empty, their data is requested when they first scroll into view.
 def get_layout():
+    data = get_data()
     return html.Div(
         id="main",
         children=[
-            dcc.Location(id="url", refresh=False),
             html.Div(
             id="header",
             children=[
@@ -176,6 +230,7 @@ def get_layout():
         ),
         html.Div(id="date-container", className="slider-container"),
         html.Div(children=[dcc.Graph(id="graph-map", config={"staticPlot": True},),]),
+        dcc.Store(id="map-data", data=get_map_data(data)),
         html.Div(
             className="slider-container",
             children=[
@@ -186,11 +241,7 @@ def get_layout():
                     id="slider-date",
                     min=0,
                     max=len(data.swiss_cases["Date"]) - 1,
-                    marks={
-                        i: date.fromisoformat(d).strftime("%d. %m.")
-                        for i, d in enumerate(data.swiss_cases["Date"])
-                        if date.fromisoformat(d).day == 1
-                    },
+                    marks=data.date_marks,
                     value=len(data.swiss_cases["Date"]) - 1,
                     updatemode="drag",
                 ),
@@ -225,6 +276,12 @@ def get_layout():
                 ),
             ],
         ),
+        html.Div(
+            children=[
+                dcc.Store(id=graph + "-base", data=get_figure(data))
+                for graph, get_figure in base_figures.items()
+            ]
+        ),
         html.Div(
             className="row",
             children=[
@@ -265,18 +322,21 @@ def get_layout():
             ],
         ),
         html.Br(),
-        html.Div(
-            className="row",
-            children=[
-                html.Div(
-                    className="six columns",
-                    children=[dcc.Graph(id="case-world-graph")],
-                ),
-                html.Div(
-                    className="six columns",
-                    children=[dcc.Graph(id="fatalities-world-graph")],
-                ),
-            ],
+        deferred_section(
+            "world-section",
+            html.Div(
+                className="row",
+                children=[
+                    html.Div(
+                        className="six columns",
+                        children=[dcc.Graph(id="case-world-graph")],
+                    ),
+                    html.Div(
+                        className="six columns",
+                        children=[dcc.Graph(id="fatalities-world-graph")],
+                    ),
+                ],
+            ),
         ),
         html.Br(),
         html.Div(
@@ -292,7 +352,12 @@ def get_layout():
             children=[
                 html.Div(
                     className="twelve columns",
-                    children=[dcc.Graph(id="caseincrease-ch-graph")],
+                    children=[
+                        dcc.Graph(
+                            id="caseincrease-ch-graph",
+                            figure=get_caseincrease_ch_figure(data),
+                        )
+                    ],
                 ),
             ],
         ),
@@ -331,6 +396,7 @@ def get_layout():
                     value=data.canton_labels,
                     multi=True,
                 ),
+                dcc.Store(id="cantonal-series", data=get_cantonal_series(data)),
             ],
         ),
         html.Div(
@@ -364,7 +430,10 @@ def get_layout():
             ],
         ),
         html.Div(id="date-container-cantonal", className="slider-container"),
-        html.Div(id="caseincrease-cantonal-data", style={"display": "none"}),
+        dcc.Store(
+            id="caseincrease-cantonal-data",
+            data=get_caseincrease_cantonal_data(data),
+        ),
         html.Div(
             className="row",
             children=[
@@ -385,11 +454,7 @@ def get_layout():
                     id="slider-date-cantonal",
                     min=0,
                     max=len(data.swiss_cases["Date"]) - 1,
-                    marks={
-                        i: date.fromisoformat(d).strftime("%d. %m.")
-                        for i, d in enumerate(data.swiss_cases["Date"])
-                        if date.fromisoformat(d).day == 1
-                    },
+                    marks=data.date_marks,
                     value=len(data.moving_total) - 1,
                     updatemode="drag",
                 ),
@@ -408,17 +473,21 @@ def get_layout():
                 )
             ],
         ),
-        html.Div(
-            className="row",
-            children=[
-                html.Div(
-                    className="six columns",
-                    children=[dcc.Graph(id="prevalence-density-graph")],
-                ),
-                html.Div(
-                    className="six columns", children=[dcc.Graph(id="cfr-age-graph")]
-                ),
-            ],
+        deferred_section(
+            "demographic-section",
+            html.Div(
+                className="row",
+                children=[
+                    html.Div(
+                        className="six columns",
+                        children=[dcc.Graph(id="prevalence-density-graph")],
+                    ),
+                    html.Div(
+                        className="six columns",
+                        children=[dcc.Graph(id="cfr-age-graph")],
+                    ),
+                ],
+            ),
         ),
         html.Br(),
         html.H4(children="Raw Data", style={"color": style.theme["accent"]}),
@@ -440,137 +509,64 @@ def get_layout():
     ],
 )
 
-app.layout = get_layout
-
 # -------------------------------------------------------------------------------
-# Callbacks
+# Figures
 # -------------------------------------------------------------------------------
-@app.callback(
-    dash.dependencies.Output("date-container", "children"),
-    [dash.dependencies.Input("slider-date", "value")],
-)
-def update_map_date(selected_date_index):
-    d = date.fromisoformat(data.swiss_cases["Date"].iloc[selected_date_index])
-    return d.strftime("%d. %m. %Y")
-
-
-@app.callback(
-    Output("graph-map", "figure"),
-    [Input("slider-date", "value"), Input("radio-prevalence", "value")],
-)
-def update_graph_map(selected_date_index, mode):
-    d = data.swiss_cases["Date"].iloc[selected_date_index]
-    date = data.swiss_cases["Date"].iloc[selected_date_index]
-
-    map_data = data.swiss_cases_by_date_filled
-    labels = [
-        canton + ": " + str(int(map_data[canton][d]))
-        if not math.isnan(float(map_data[canton][d]))
-        else ""
-        for canton in data.cantonal_centres
-    ]
-
-    if mode == "prevalence":
-        map_data = data.swiss_cases_by_date_filled_per_capita
-        labels = [
-            canton + ": " + str(round((map_data[canton][d]), 1))
-            if not math.isnan(float(map_data[canton][d]))
-            else ""
-            for canton in data.cantonal_centres
-        ]
-    elif mode == "fatalities":
-        map_data = data.swiss_fatalities_by_date_filled
-        labels = [
-            canton + ": " + str(int(map_data[canton][d]))
-            if not math.isnan(float(map_data[canton][d]))
-            else ""
-            for canton in data.cantonal_centres
-        ]
-    elif mode == "new":
-        map_data = data.swiss_cases_by_date_diff
-        labels = [
-            canton + ": " + str(int(map_data[canton][d]))
-            if not math.isnan(float(map_data[canton][d]))
-            else ""
-            for canton in data.cantonal_centres
-        ]
-    elif mode == "new_fatalities":
-        map_data = data.swiss_fatalities_by_date_diff
-        labels = [
-            canton + ": " + str(int(map_data[canton][d]))
-            if not math.isnan(float(map_data[canton][d]))
-            else ""
-            for canton in data.cantonal_centres
-        ]
-    elif mode == "new_hospitalizations":
-        map_data = data.swiss_hospitalizations_by_date_diff
-        labels = [
-            canton + ": " + str(int(map_data[canton][d]))
-            if not math.isnan(float(map_data[canton][d]))
-            else ""
-            for canton in data.cantonal_centres
-        ]
-    elif mode == "hospitalizations":
-        map_data = data.swiss_hospitalizations_by_date_filled
-        labels = [
-            canton + ": " + str(int(map_data[canton][d]))
-            if not math.isnan(float(map_data[canton][d]))
-            else ""
-            for canton in data.cantonal_centres
-        ]
-
+def get_map_data(data):
     return {
-        "data": [
-            {
-                "lat": [
-                    data.cantonal_centres[canton]["lat"]
-                    for canton in data.cantonal_centres
-                ],
-                "lon": [
-                    data.cantonal_centres[canton]["lon"]
-                    for canton in data.cantonal_centres
-                ],
-                "text": labels,
-                "mode": "text",
-                "type": "scattergeo",
-                "textfont": {
-                    "family": "Arial, sans-serif",
-                    "size": 16,
-                    "color": "white",
-                    "weight": "bold",
+        **data.map_frames,
+        "label_states": list(data.cantonal_centres),
+        "figure": {
+            "data": [
+                {
+                    "lat": [
+                        data.cantonal_centres[canton]["lat"]
+                        for canton in data.cantonal_centres
+                    ],
+                    "lon": [
+                        data.cantonal_centres[canton]["lon"]
+                        for canton in data.cantonal_centres
+                    ],
+                    "mode": "text",
+                    "type": "scattergeo",
+                    "textfont": {
+                        "family": "Arial, sans-serif",
+                        "size": 16,
+                        "color": "white",
+                        "weight": "bold",
+                    },
                 },
+                {
+                    "type": "choropleth",
+                    "showscale": False,
+                    "locations": data.canton_labels,
+                    "colorscale": style.turbo,
+                    "geojson": map_geometry,
+                    "marker": {"line": {"width": 0.0, "color": "#08302A"}},
+                    #                "colorbar": {
+                    #                    "thickness": 10,
+                    #                    "bgcolor": "#252e3f",
+                    #                    "tickfont": {"color": "white"},
+                    #                },
+                },
+            ],
+            "layout": {
+                "geo": {
+                    "visible": False,
+                    "center": {"lat": 47.700033, "lon": 13.263449},
+                    "lataxis": {"range": [46.2845, 49.6406]},
+                    "lonaxis": {"range": [9.5223, 17.363449]},
+                    # "fitbounds": "geojson",
+                    "projection": {"type": "transverse mercator"},
+                    # "landcolor": "#1f2630",
+                    # "showland": True,
+                    # "showcountries": True,
+                },
+                "margin": {"l": 0, "r": 0, "t": 0, "b": 0},
+                "height": 600,
+                "plot_bgcolor": "#252e3f",
+                "paper_bgcolor": "#252e3f",
             },
-            {
-                "type": "choropleth",
-                "showscale": False,
-                "locations": data.canton_labels,
-                "z": [map_data[canton][d] for canton in map_data if canton != "AT"],
-                "colorscale": style.turbo,
-                "geojson": "/assets/austria.geojson",
-                "marker": {"line": {"width": 0.0, "color": "#08302A"}},
-#                "colorbar": {
-#                    "thickness": 10,
-#                    "bgcolor": "#252e3f",
-#                    "tickfont": {"color": "white"},
-#                },
-            },
-        ],
-        "layout": {
-            "geo": {
-                "visible": False,
-                "center": {"lat": 47.700033, "lon": 13.263449},
-                "lataxis": {"range": [46.2845, 49.6406]},
-                "lonaxis": {"range": [9.5223, 17.363449]},
-                # "fitbounds": "geojson",
-                "projection": {"type": "transverse mercator"},
-                # "landcolor": "#1f2630",
-                # "showland": True,
-                # "showcountries": True,
-            },
-            "margin": {"l": 0, "r": 0, "t": 0, "b": 0},
-            "height": 600,
-            "plot_bgcolor": "#252e3f",
-            "paper_bgcolor": "#252e3f",
         },
     }
 
@@ -578,10 +574,7 @@ def update_graph_map(selected_date_index, mode):
 #
 # Total cases Austria
 #
-@app.callback(
-    Output("case-ch-graph", "figure"), [Input("radio-scale-switzerland", "value")],
-)
-def update_case_ch_graph(selected_scale):
+def get_case_ch_figure(data):
     return {
         "data": [
             {
@@ -598,7 +591,6 @@ def update_case_ch_graph(selected_scale):
             "height": 400,
             "xaxis": {"showgrid": True, "color": "#ffffff"},
             "yaxis": {
-                "type": selected_scale,
                 "showgrid": True,
                 "color": "#ffffff",
                 "rangemode": "tozero",
@@ -613,11 +605,7 @@ def update_case_ch_graph(selected_scale):
         },
     }
 
-@app.callback(
-    Output("caseincrease-ch-graph", "figure"),
-    [Input("radio-scale-switzerland", "value")],
-)
-def update_caseincrease_ch_graph(selected_scale):
+def get_caseincrease_ch_figure(data):
     return {
         "data": [
             {
@@ -676,11 +664,7 @@ def update_caseincrease_ch_graph(selected_scale):
         },
     }
 
-@app.callback(
-    Output("fatalities-ch-graph", "figure"),
-    [Input("radio-scale-switzerland", "value")],
-)
-def update_fatalities_ch_graph(selected_scale):
+def get_fatalities_ch_figure(data):
     return {
         "data": [
             {
@@ -697,7 +681,6 @@ def update_fatalities_ch_graph(selected_scale):
             "height": 400,
             "xaxis": {"showgrid": True, "color": "#ffffff"},
             "yaxis": {
-                "type": selected_scale,
                 "showgrid": True,
                 "color": "#ffffff",
                 "rangemode": "tozero",
@@ -712,11 +695,7 @@ def update_fatalities_ch_graph(selected_scale):
         },
     }
     
-@app.callback(
-    Output("new-case-ch-graph", "figure"),
-    [Input("radio-scale-switzerland", "value")],
-)
-def update_new_case_ch_graph(selected_scale):
+def get_new_case_ch_figure(data):
     total_column_name = "AT"
     return {
         "data": [
@@ -745,7 +724,6 @@ def update_new_case_ch_graph(selected_scale):
                 "color": "#ffffff",
             },
             "yaxis": {
-                "type": selected_scale,
                 "showgrid": True,
                 "color": "#ffffff",
                 "rangemode": "tozero",
@@ -903,11 +881,7 @@ def update_new_case_ch_graph(selected_scale):
         },
     }
 
-@app.callback(
-    Output("new-fatalities-ch-graph", "figure"),
-    [Input("radio-scale-switzerland", "value")],
-)
-def update_new_fatalities_ch_graph(selected_scale):
+def get_new_fatalities_ch_figure(data):
     total_column_name = "AT"
     return {
         "data": [
@@ -938,7 +912,6 @@ def update_new_fatalities_ch_graph(selected_scale):
                 "color": "#ffffff",
             },
             "yaxis": {
-                "type": selected_scale,
                 "showgrid": True,
                 "color": "#ffffff",
                 "rangemode": "tozero",
@@ -1096,11 +1069,7 @@ def update_new_fatalities_ch_graph(selected_scale):
         },
     }
 
-@app.callback(
-    Output("hospitalizations-ch-graph", "figure"),
-    [Input("radio-scale-switzerland", "value")],
-)
-def update_hospitalizations_ch_graph(selected_scale):
+def get_hospitalizations_ch_figure(data):
     return {
         "data": [
             {
@@ -1124,7 +1093,6 @@ def update_hospitalizations_ch_graph(selected_scale):
             "height": 400,
             "xaxis": {"showgrid": True, "color": "#ffffff"},
             "yaxis": {
-                "type": selected_scale,
                 "showgrid": True,
                 "color": "#ffffff",
                 "rangemode": "tozero",
@@ -1149,10 +1117,7 @@ def update_hospitalizations_ch_graph(selected_scale):
     }
 
 
-@app.callback(
-    Output("releases-ch-graph", "figure"), [Input("radio-scale-switzerland", "value")],
-)
-def update_releases_ch_graph(selected_scale):
+def get_releases_ch_figure(data):
     return {
         "data": [
             {
@@ -1169,7 +1134,6 @@ def update_releases_ch_graph(selected_scale):
             "height": 400,
             "xaxis": {"showgrid": True, "color": "#ffffff"},
             "yaxis": {
-                "type": selected_scale,
                 "showgrid": True,
                 "color": "#ffffff",
                 "rangemode": "tozero",
@@ -1188,10 +1152,7 @@ def update_releases_ch_graph(selected_scale):
 #
 # Total cases world
 #
-@app.callback(
-    Output("case-world-graph", "figure"), [Input("radio-scale-switzerland", "value")],
-)
-def update_case_world_graph(selected_scale):
+def get_case_world_figure(data):
     return {
         "data": [
             {
@@ -1211,7 +1172,6 @@ def update_case_world_graph(selected_scale):
                 "title": "Days Since Prevalence >0.4 per 10,000",
             },
             "yaxis": {
-                "type": selected_scale,
                 "showgrid": True,
                 "color": "#ffffff",
                 "title": "Reported Cases / Population * 10,000",
@@ -1235,11 +1195,7 @@ def update_case_world_graph(selected_scale):
     }
 
 
-@app.callback(
-    Output("fatalities-world-graph", "figure"),
-    [Input("radio-scale-switzerland", "value")],
-)
-def update_fatalities_world_graph(selected_scale):
+def get_fatalities_world_figure(data):
     return {
         "data": [
             {
@@ -1257,7 +1213,6 @@ def update_fatalities_world_graph(selected_scale):
             "height": 400,
             "xaxis": {"showgrid": True, "color": "#ffffff", "title": "Country"},
             "yaxis": {
-                "type": selected_scale,
                 "showgrid": True,
                 "color": "#ffffff",
                 "rangemode": "tozero",
@@ -1272,168 +1227,114 @@ def update_fatalities_world_graph(selected_scale):
     }
 
 
+# Figures of the Austria and world graphs, by graph ID. Their traces do not
+# depend on the selected scale, so they are sent once, and the y-axis type is
+# set in the browser.
+scaled_figures = {
+    "case-ch-graph": get_case_ch_figure,
+    "fatalities-ch-graph": get_fatalities_ch_figure,
+    "new-case-ch-graph": get_new_case_ch_figure,
+    "new-fatalities-ch-graph": get_new_fatalities_ch_figure,
+    "hospitalizations-ch-graph": get_hospitalizations_ch_figure,
+    "releases-ch-graph": get_releases_ch_figure,
+    "case-world-graph": get_case_world_figure,
+    "fatalities-world-graph": get_fatalities_world_figure,
+}
+
+
 #
 # Cantonal Data
 #
-@app.callback(
-    Output("case-graph", "figure"),
-    [Input("dropdown-cantons", "value"), Input("radio-scale-cantons", "value")],
-)
-def update_case_graph(selected_cantons, selected_scale):
+def get_cantonal_series(data):
+    cantons = data.canton_labels
+    new_cases = data.swiss_cases_by_date_filled[cantons].fillna(0).diff().fillna(0)
     return {
-        "data": [
-            {
-                "x": data.swiss_cases_as_dict["Date"],
-                "y": data.swiss_cases_as_dict[canton],
-                "name": canton,
-                "marker": {"color": style.canton_colors[canton]},
-            }
-            for _, canton in enumerate(data.swiss_cases_as_dict)
-            if canton in selected_cantons
-        ],
-        "layout": {
-            "title": "Cases per State",
-            "height": 400,
-            "xaxis": {"showgrid": True, "color": "#ffffff"},
-            "yaxis": {
-                "type": selected_scale,
-                "showgrid": True,
-                "color": "#ffffff",
-                "title": "Reported Cases",
+        "dates": data.swiss_cases_as_dict["Date"],
+        "states": cantons,
+        "colors": {canton: style.canton_colors[canton] for canton in cantons},
+        "values": {
+            "cases": {
+                canton: data.swiss_cases_as_dict[canton] for canton in cantons
             },
-            "dragmode": False,
-            "margin": {"l": 60, "r": 20, "t": 60, "b": 40},
-            "plot_bgcolor": style.theme["background"],
-            "paper_bgcolor": style.theme["background"],
-            "font": {"color": style.theme["foreground"]},
+            "cases_pc": {
+                canton: data.swiss_cases_normalized_as_dict[canton]
+                for canton in cantons
+            },
+            "new_cases": {canton: new_cases[canton].values for canton in cantons},
         },
-    }
-
-
-@app.callback(
-    Output("case-pc-graph", "figure"),
-    [Input("dropdown-cantons", "value"), Input("radio-scale-cantons", "value")],
-)
-def update_case_pc_graph(selected_cantons, selected_scale):
-    return {
-        "data": [
-            {
-                "x": data.swiss_cases_normalized_as_dict["Date"],
-                "y": data.swiss_cases_normalized_as_dict[canton],
-                "name": canton,
-                "marker": {"color": style.canton_colors[canton]},
-            }
-            for _, canton in enumerate(data.swiss_cases_normalized_as_dict)
-            if canton in selected_cantons
-        ],
-        "layout": {
-            "title": "Cases per State (per 10,000 Inhabitants)",
-            "height": 400,
-            "xaxis": {"showgrid": True, "color": "#ffffff"},
-            "yaxis": {
-                "type": selected_scale,
-                "showgrid": True,
-                "color": "#ffffff",
-                "title": "Reported Cases / Population * 10,000",
+        # The y-axis type of the first two is set in the browser
+        "layouts": {
+            "case-graph": {
+                "title": "Cases per State",
+                "height": 400,
+                "xaxis": {"showgrid": True, "color": "#ffffff"},
+                "yaxis": {
+                    "showgrid": True,
+                    "color": "#ffffff",
+                    "title": "Reported Cases",
+                },
+                "dragmode": False,
+                "margin": {"l": 60, "r": 20, "t": 60, "b": 40},
+                "plot_bgcolor": style.theme["background"],
+                "paper_bgcolor": style.theme["background"],
+                "font": {"color": style.theme["foreground"]},
+            },
+            "case-pc-graph": {
+                "title": "Cases per State (per 10,000 Inhabitants)",
+                "height": 400,
+                "xaxis": {"showgrid": True, "color": "#ffffff"},
+                "yaxis": {
+                    "showgrid": True,
+                    "color": "#ffffff",
+                    "title": "Reported Cases / Population * 10,000",
+                },
+                "dragmode": False,
+                "margin": {"l": 60, "r": 20, "t": 60, "b": 40},
+                "plot_bgcolor": style.theme["background"],
+                "paper_bgcolor": style.theme["background"],
+                "font": {"color": style.theme["foreground"]},
+            },
+            "case-graph-diff": {
+                "title": "Newly Reported Cases per State",
+                "height": 700,
+                "xaxis": {"showgrid": True, "color": "#ffffff"},
+                "yaxis": {
+                    "type": "linear",
+                    "showgrid": True,
+                    "color": "#ffffff",
+                    "title": "Reported Cases",
+                },
+                "dragmode": False,
+                "margin": {"l": 60, "r": 20, "t": 60, "b": 40},
+                "plot_bgcolor": style.theme["background"],
+                "paper_bgcolor": style.theme["background"],
+                "font": {"color": style.theme["foreground"]},
+                "barmode": "stack",
             },
-            "dragmode": False,
-            "margin": {"l": 60, "r": 20, "t": 60, "b": 40},
-            "plot_bgcolor": style.theme["background"],
-            "paper_bgcolor": style.theme["background"],
-            "font": {"color": style.theme["foreground"]},
         },
     }
 
 
-@app.callback(
-    Output("case-graph-diff", "figure"),
-    [Input("dropdown-cantons", "value"), Input("radio-scale-cantons", "value")],
-)
-def update_case_graph_diff(selected_cantons, selected_scale):
-    data_non_nan = {}
-    data_non_nan["Date"] = data.swiss_cases_as_dict["Date"]
-
-    for canton in data.swiss_cases_as_dict:
-        if canton == "Date":
-            continue
-        values = []
-        last_value = 0
-        for _, v in enumerate(data.swiss_cases_as_dict[canton]):
-            if math.isnan(float(v)):
-                values.append(last_value)
-            else:
-                last_value = v
-                values.append(v)
-        data_non_nan[canton] = values
-
+def get_caseincrease_cantonal_data(data):
+    # One array per state, in the order of the dates
+    cantons = data.canton_labels
     return {
-        "data": [
-            {
-                "x": data_non_nan["Date"],
-                "y": [0]
-                + [
-                    j - i
-                    for i, j in zip(data_non_nan[canton][:-1], data_non_nan[canton][1:])
-                ],
-                "name": canton,
-                "marker": {"color": style.canton_colors[canton]},
-                "type": "bar",
-            }
-            for i, canton in enumerate(data.swiss_cases_as_dict)
-            if canton in selected_cantons
-        ],
-        "layout": {
-            "title": "Newly Reported Cases per State",
-            "height": 700,
-            "xaxis": {"showgrid": True, "color": "#ffffff"},
-            "yaxis": {
-                "type": "linear",
-                "showgrid": True,
-                "color": "#ffffff",
-                "title": "Reported Cases",
-            },
-            "dragmode": False,
-            "margin": {"l": 60, "r": 20, "t": 60, "b": 40},
-            "plot_bgcolor": style.theme["background"],
-            "paper_bgcolor": style.theme["background"],
-            "font": {"color": style.theme["foreground"]},
-            "barmode": "stack",
+        "version": data.version,
+        "states": cantons,
+        "date_labels": data.moving_total["date_label"].values,
+        "swiss_cases_by_date_filled": {
+            canton: data.swiss_cases_by_date_filled[canton].values
+            for canton in cantons
+        },
+        "moving_total": {
+            canton: data.moving_total[canton].values for canton in cantons
         },
     }
 
-app.clientside_callback(
-    ClientsideFunction(
-        namespace="clientside", function_name="update_caseincrease_cantonal_graph"
-    ),
-    Output("caseincrease-cantonal-graph", "figure"),
-    [
-        Input("dropdown-cantons", "value"),
-        Input("radio-scale-cantons", "value"),
-        Input("slider-date-cantonal", "value"),
-        Input("caseincrease-cantonal-graph", "hoverData"),
-    ],
-)
-
-
-@app.callback(
-    Output("caseincrease-cantonal-data", "children"), [Input("url", "pathname")]
-)
-def store_caseincrease_cantona_data(value):
-    return (
-        '{"swiss_cases_by_date_filled": '
-        + data.swiss_cases_by_date_filled.to_json(date_format="iso", orient="columns")
-        + ', "moving_total":'
-        + data.moving_total.to_json(date_format="iso", orient="columns")
-        + "}"
-    )
-
 #
 # Demographic Correlations
 #
-@app.callback(
-    Output("prevalence-density-graph", "figure"), [Input("dropdown-cantons", "value")],
-)
-def update_prevalence_density_graph(selected_cantons):
+def get_prevalence_density_figure(data):
     return {
         "data": [
 #            {
@@ -1463,7 +1364,7 @@ def update_prevalence_density_graph(selected_cantons):
                 + f"Cases: <b>{data.swiss_cases_by_date_filled.iloc[-1][canton]:.0f}</b>",
             }
             for _, canton in enumerate(data.swiss_cases_as_dict)
-            if canton in selected_cantons
+            if canton in data.canton_labels
         ],
         "layout": {
             "title": "Prevalence vs Population Density",
@@ -1505,10 +1406,7 @@ def update_prevalence_density_graph(selected_cantons):
     }
 
 
-@app.callback(
-    Output("cfr-age-graph", "figure"), [Input("dropdown-cantons", "value")],
-)
-def update_cfr_age_graph(selected_cantons):
+def get_cfr_age_figure(data):
     return {
         "data": [
             {
@@ -1537,7 +1435,7 @@ def update_cfr_age_graph(selected_cantons):
                 + f"Cases: <b>{data.swiss_cases_by_date_filled.iloc[-1][canton]:.0f}</b>",
             }
             for _, canton in enumerate(data.swiss_cases_normalized_as_dict)
-            if canton in selected_cantons
+            if canton in data.canton_labels
         ],
         "layout": {
             "title": "Case Fatality Ratio vs Population over 65",
@@ -1583,6 +1481,184 @@ def update_cfr_age_graph(selected_cantons):
     }
 
 
+# Figures of the sections below the fold, by section and graph ID
+deferred_figures = {
+    "world-section": {
+        "case-world-graph": get_case_world_figure,
+        "fatalities-world-graph": get_fatalities_world_figure,
+    },
+    "demographic-section": {
+        "prevalence-density-graph": get_prevalence_density_figure,
+        "cfr-age-graph": get_cfr_age_figure,
+    },
+}
+
+# Figures stored in the layout, by graph ID
+base_figures = {
+    graph: get_figure
+    for graph, get_figure in scaled_figures.items()
+    if not any(graph in figures for figures in deferred_figures.values())
+}
+
+# Dash builds the layout to validate the first callback, so it is set once
+# the figures are defined
+app.layout = get_layout
+
+# -------------------------------------------------------------------------------
+# Callbacks
+# -------------------------------------------------------------------------------
+# The map is redrawn in the browser from the precomputed frames, so dragging
+# the slider does not hit the server
+app.clientside_callback(
+    ClientsideFunction(namespace="clientside", function_name="update_map_date"),
+    Output("date-container", "children"),
+    [Input("slider-date", "value"), Input("map-data", "data")],
+)
+
+app.clientside_callback(
+    ClientsideFunction(namespace="clientside", function_name="update_graph_map"),
+    Output("graph-map", "figure"),
+    [
+        Input("slider-date", "value"),
+        Input("radio-prevalence", "value"),
+        Input("map-data", "data"),
+    ],
+)
+
+
+for graph in scaled_figures:
+    app.clientside_callback(
+        ClientsideFunction(namespace="clientside", function_name="set_yaxis_type"),
+        Output(graph, "figure"),
+        [Input(graph + "-base", "data"), Input("radio-scale-switzerland", "value")],
+    )
+
+
+# Selecting states and switching the scale redraw the graphs in the browser
+app.clientside_callback(
+    ClientsideFunction(namespace="clientside", function_name="update_case_graph"),
+    Output("case-graph", "figure"),
+    [
+        Input("cantonal-series", "data"),
+        Input("dropdown-cantons", "value"),
+        Input("radio-scale-cantons", "value"),
+    ],
+)
+
+app.clientside_callback(
+    ClientsideFunction(namespace="clientside", function_name="update_case_pc_graph"),
+    Output("case-pc-graph", "figure"),
+    [
+        Input("cantonal-series", "data"),
+        Input("dropdown-cantons", "value"),
+        Input("radio-scale-cantons", "value"),
+    ],
+)
+
+app.clientside_callback(
+    ClientsideFunction(
+        namespace="clientside", function_name="update_case_graph_diff"
+    ),
+    Output("case-graph-diff", "figure"),
+    [Input("cantonal-series", "data"), Input("dropdown-cantons", "value")],
+)
+
+app.clientside_callback(
+    ClientsideFunction(
+        namespace="clientside", function_name="update_caseincrease_cantonal_graph"
+    ),
+    Output("caseincrease-cantonal-graph", "figure"),
+    [
+        Input("dropdown-cantons", "value"),
+        Input("radio-scale-cantons", "value"),
+        Input("slider-date-cantonal", "value"),
+        Input("caseincrease-cantonal-graph", "hoverData"),
+        Input("caseincrease-cantonal-data", "data"),
+    ],
+)
+
+
+# The regression figures hold every state, the selected ones are picked in the
+# browser
+for graph in ["prevalence-density-graph", "cfr-age-graph"]:
+    app.clientside_callback(
+        ClientsideFunction(namespace="clientside", function_name="select_states"),
+        Output(graph, "figure"),
+        [Input(graph + "-base", "data"), Input("dropdown-cantons", "value")],
+    )
+
+
+# The figures of a deferred section are requested when the browser first
+# shows it. Its trigger is an input of the clientside gate only, so Dash calls
+# the gate on page load, which then watches the section, but not the server.
+def load_section(figures):
+    def load(visible):
+        data = get_data()
+        return [get_figure(data) for get_figure in figures.values()]
+
+    return load
+
+
+for section, figures in deferred_figures.items():
+    app.clientside_callback(
+        ClientsideFunction(namespace="clientside", function_name="load_when_visible"),
+        Output(section + "-visible", "data"),
+        [Input(section + "-trigger", "n_clicks")],
+        [State(section, "id")],
+    )
+    app.callback(
+        [Output(graph + "-base", "data") for graph in figures],
+        [Input(section + "-visible", "data")],
+    )(load_section(figures))
+
+
+#
+# Serialize the responses without walking the arrays in Python
+#
+serialization.serialize_callbacks(app)
+
+#
+# Responses and the layout only depend on the inputs and the dataset, reuse
+# them until the dataset is swapped
+#
+figure_cache = FigureCache(
+    parser.getint("cache", "figures_max_bytes", fallback=64 * 1024 * 1024)
+)
+figure_cache.memoize_callbacks(app, lambda: get_data().version)
+figure_cache.memoize_layout(app, lambda: get_data().version, serialization.dumps)
+refresher.on_swap(lambda old, new: figure_cache.clear())
+
+metrics = Metrics()
+metrics.instrument(server, app.callback_map)
+metrics.gauge(
+    "data_build_seconds",
+    "Time it took to load the current dataset.",
+    lambda: refresher.build_seconds,
+)
+metrics.gauge(
+    "data_age_seconds",
+    "Time since the current dataset was loaded.",
+    lambda: time.time() - refresher.loaded_at,
+)
+metrics.gauge(
+    "data_latest_date_timestamp_seconds",
+    "Start of the last day in the dataset.",
+    lambda: datetime.fromisoformat(get_data().latest_date)
+    .replace(tzinfo=timezone("UTC"))
+    .timestamp(),
+)
+metrics.gauge("figure_cache_bytes", "Size of the cached responses.", lambda: figure_cache.size)
+metrics.counter(
+    "figure_cache_hits_total",
+    "Responses served from the cache.",
+    lambda: figure_cache.hits,
+)
+metrics.counter(
+    "figure_cache_misses_total", "Responses computed.", lambda: figure_cache.misses
+)
+metrics.serve(server)
+
+
 if __name__ == "__main__":
     app.run_server(
         # debug=True,
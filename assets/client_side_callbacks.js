@@ -1,60 +1,230 @@
 if (!window.dash_clientside) {
   window.dash_clientside = {};
 }
-window.dash_clientside.clientside = {
-  update_caseincrease_cantonal_graph: function (selected_cantons, selected_scale, selected_date_index, hover_data) {
 
-    hovered_canton = ""
-    if (hover_data)
-      hovered_canton = selected_cantons[hover_data["points"][0]["curveNumber"]]
+// One trace per selected state, in the order of the states
+function cantonal_figure(series, name, selected_cantons, layout, trace) {
+  return {
+    data: series.states.filter(function (canton) {
+      return selected_cantons.indexOf(canton) !== -1
+    }).map(function (canton) {
+      return Object.assign({
+        x: series.dates,
+        y: series.values[name][canton],
+        name: canton,
+        marker: { color: series.colors[canton] }
+      }, trace)
+    }),
+    layout: layout
+  }
+}
 
-    var d = selected_date_index
-    var data_raw = {}
-    try {
-      data_raw = JSON.parse(document.getElementById("caseincrease-cantonal-data").innerHTML)
-    } catch (err) {
-      console.log(err)
-      // try again
-      console.log("innerhtml: '" + document.getElementById("caseincrease-cantonal-data").innerHTML + "'")
-      data_raw = JSON.parse(document.getElementById("caseincrease-cantonal-data").innerHTML)
+function with_yaxis_type(layout, scale) {
+  return Object.assign({}, layout, {
+    yaxis: Object.assign({}, layout.yaxis, { type: scale })
+  })
+}
+
+// Inputs and data of the last figure drawn and the maxima of each state in
+// that data, for update_caseincrease_cantonal_graph
+var caseincrease_cantonal_state = {
+  inputs: null,
+  data: null,
+  hovered_canton: "",
+  x_max: {},
+  y_max: {}
+}
+
+function line_style(hovered) {
+  return {
+    width: hovered ? 2.0 : 1.0,
+    color: hovered ? "#2cfec1" : "rgba(255, 255, 255, 0.5)"
+  }
+}
+
+function series_max(values) {
+  var max = 0
+  for (var i = 0; i < values.length; i++)
+    if (values[i] > max)
+      max = values[i]
+  return max
+}
+
+// The element plotly draws into, inside the dcc.Graph with the given id
+function plotly_div(id) {
+  var element = document.getElementById(id)
+  if (!element || element.classList.contains("js-plotly-plot"))
+    return element
+  return element.querySelector(".js-plotly-plot")
+}
+
+// Calls callback once, when the element with the given id is first within
+// 200 px of the viewport. An element in a collapsed container is not, so it
+// counts as visible once that is expanded.
+function when_visible(id, callback) {
+  var element = document.getElementById(id)
+  if (!element) {
+    // Not rendered yet
+    window.requestAnimationFrame(function () { when_visible(id, callback) })
+    return
+  }
+  if (!("IntersectionObserver" in window)) {
+    callback()
+    return
+  }
+  var observer = new IntersectionObserver(function (entries) {
+    if (entries.some(function (entry) { return entry.isIntersecting })) {
+      observer.disconnect()
+      callback()
     }
+  }, { rootMargin: "200px 0px" })
+  observer.observe(element)
+}
+
+window.dash_clientside.clientside = {
+  update_case_graph: function (series, selected_cantons, selected_scale) {
+    if (!series)
+      return window.dash_clientside.no_update
+
+    return cantonal_figure(series, "cases", selected_cantons,
+      with_yaxis_type(series.layouts["case-graph"], selected_scale), {})
+  },
+
+  update_case_pc_graph: function (series, selected_cantons, selected_scale) {
+    if (!series)
+      return window.dash_clientside.no_update
+
+    return cantonal_figure(series, "cases_pc", selected_cantons,
+      with_yaxis_type(series.layouts["case-pc-graph"], selected_scale), {})
+  },
+
+  update_case_graph_diff: function (series, selected_cantons) {
+    if (!series)
+      return window.dash_clientside.no_update
+
+    return cantonal_figure(series, "new_cases", selected_cantons,
+      series.layouts["case-graph-diff"], { type: "bar" })
+  },
 
-    var data = {
-      swiss_cases_by_date_filled: {},
-      moving_total: []
+  set_yaxis_type: function (figure, scale) {
+    if (!figure)
+      return window.dash_clientside.no_update
+
+    // Only the layout is replaced, the traces are reused as they are
+    return Object.assign({}, figure, {
+      layout: with_yaxis_type(figure.layout, scale)
+    })
+  },
+
+  load_when_visible: function (n_clicks, section) {
+    if (n_clicks)
+      return true
+
+    // Called on page load: the section's data is requested by clicking its
+    // hidden trigger once it is visible, which calls this again
+    when_visible(section, function () {
+      document.getElementById(section + "-trigger").click()
+    })
+    return window.dash_clientside.no_update
+  },
+
+  select_states: function (figure, selected_cantons) {
+    if (!figure)
+      return window.dash_clientside.no_update
+
+    // Traces without a name, like the regression line, are always shown
+    return Object.assign({}, figure, {
+      data: figure.data.filter(function (trace) {
+        return trace.name === undefined || selected_cantons.indexOf(trace.name) !== -1
+      })
+    })
+  },
+
+  update_map_date: function (selected_date_index, map_data) {
+    if (!map_data)
+      return window.dash_clientside.no_update
+
+    var d = map_data.dates[selected_date_index].split("-")
+    return d[2] + ". " + d[1] + ". " + d[0]
+  },
+
+  update_graph_map: function (selected_date_index, mode, map_data) {
+    if (!map_data)
+      return window.dash_clientside.no_update
+
+    var states = map_data.states
+    var values = map_data.modes[mode].values
+    var decimals = map_data.modes[mode].decimals
+    var offset = selected_date_index * states.length
+    var z = values.slice(offset, offset + states.length)
+
+    // The labels are placed in the order of the cantonal centres
+    var labels = map_data.label_states.map(function (canton) {
+      var value = z[states.indexOf(canton)]
+      if (value === null || value === undefined)
+        return ""
+      return canton + ": " + (decimals > 0 ? value.toFixed(decimals) : value)
+    })
+
+    // New trace objects, so that the graph is redrawn
+    var figure = map_data.figure
+    return {
+      data: [
+        Object.assign({}, figure.data[0], { text: labels }),
+        Object.assign({}, figure.data[1], { z: z })
+      ],
+      layout: figure.layout
     }
+  },
+
+  update_caseincrease_cantonal_graph: function (selected_cantons, selected_scale, selected_date_index, hover_data, data) {
+    if (!data)
+      return window.dash_clientside.no_update
+
+    var hovered_canton = ""
+    if (hover_data)
+      hovered_canton = selected_cantons[hover_data["points"][0]["curveNumber"]]
 
-    // Format the data & let's support IE
-    for (var key in data_raw["swiss_cases_by_date_filled"]) {
-      if (data_raw["swiss_cases_by_date_filled"].hasOwnProperty(key)) {
-        values = []
-        for (var subkey in data_raw["swiss_cases_by_date_filled"][key]) {
-          if (data_raw["swiss_cases_by_date_filled"][key].hasOwnProperty(subkey)) {
-            values.push(data_raw["swiss_cases_by_date_filled"][key][subkey])
-          }
-        }
-        data["swiss_cases_by_date_filled"][key] = values
+    // When only the hovered state changed, restyle the two affected traces
+    // instead of rebuilding the figure
+    var inputs = JSON.stringify([selected_cantons, selected_scale, selected_date_index])
+    var state = caseincrease_cantonal_state
+    var graph = plotly_div("caseincrease-cantonal-graph")
+    if (inputs === state.inputs && data === state.data && graph && window.Plotly) {
+      if (hovered_canton !== state.hovered_canton) {
+        var changed = [state.hovered_canton, hovered_canton]
+          .map(canton => selected_cantons.indexOf(canton))
+          .filter(i => i !== -1)
+        if (changed.length > 0)
+          Plotly.restyle(graph, {
+            "line.width": changed.map(i => line_style(selected_cantons[i] === hovered_canton).width),
+            "line.color": changed.map(i => line_style(selected_cantons[i] === hovered_canton).color)
+          }, changed)
+        state.hovered_canton = hovered_canton
       }
+      return window.dash_clientside.no_update
     }
 
-    for (var key in data_raw["moving_total"]) {
-      if (data_raw["moving_total"].hasOwnProperty(key)) {
-        values = []
-        for (var subkey in data_raw["moving_total"][key]) {
-          if (data_raw["moving_total"][key].hasOwnProperty(subkey)) {
-            values.push(data_raw["moving_total"][key][subkey])
-          }
-        }
-        data["moving_total"][key] = values
-      }
+    var d = selected_date_index
+
+    // The maxima of every state are computed once per data, which the store
+    // replaces with a new object when it changes
+    if (state.data !== data) {
+      state.data = data
+      state.x_max = {}
+      state.y_max = {}
+      data.states.forEach(canton => {
+        state.x_max[canton] = series_max(data["swiss_cases_by_date_filled"][canton])
+        state.y_max[canton] = series_max(data["moving_total"][canton])
+      })
     }
 
     var x_max = 0
     var y_max = 0
 
     selected_cantons.forEach(canton => {
-      x_max = Math.max(x_max, Math.max(...data["swiss_cases_by_date_filled"][canton]))
-      y_max = Math.max(y_max, Math.max(...data["moving_total"][canton]))
+      x_max = Math.max(x_max, state.x_max[canton])
+      y_max = Math.max(y_max, state.y_max[canton])
     })
 
     traces = []
@@ -67,11 +237,8 @@ window.dash_clientside.clientside = {
         marker: {
           color: "#2cfec1"
         },
-        line: {
-          width: hovered_canton == canton ? 2.0 : 1.0,
-          color: hovered_canton == canton ? "#2cfec1" : "rgba(255, 255, 255, 0.5)",
-        },
-        text: data.moving_total["date_label"].slice(6, d),
+        line: line_style(hovered_canton == canton),
+        text: data.date_labels.slice(6, d),
         hovertemplate: "<br><span style='font-size:2.0em'><b>" +
           canton +
           ": %{y:.0f}</b></span> new cases<br>" +
@@ -98,7 +265,10 @@ window.dash_clientside.clientside = {
     })
 
     // Updated the header
-    document.getElementById("date-container-cantonal").innerHTML = data.moving_total["date_label"][d - 1]
+    document.getElementById("date-container-cantonal").innerHTML = data.date_labels[d - 1]
+
+    state.inputs = inputs
+    state.hovered_canton = hovered_canton
 
     return {
       data: traces,
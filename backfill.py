@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""Rebuilds the history of the data files from archived snapshots of the
+ministry page, e.g. after a correction or when adding a new metric.
+
+    python backfill.py SNAPSHOT_DIRECTORY [--workers N]
+
+Every *.html or *.html.gz file in the directory is parsed like update_data.py
+parses the live page, in a pool of processes. The day of a snapshot is taken
+from its file name if it contains one (e.g. 2020-04-01.html), otherwise from
+the date of the table. If there are several snapshots of a day, the last one
+by file name is used. All days are then written to the files in one
+transaction, replacing the rows of the same dates.
+"""
+import argparse
+import glob
+import gzip
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from dashcoch import transaction
+from update_data import (
+    FILE_CASES,
+    FILE_DISTRICT_CASES,
+    FILE_FATALITIES,
+    FILE_HOSPITALIZATIONS,
+    FILE_ICUS,
+    FILE_RELEASES,
+    get_district_row,
+    get_row,
+    retrieve,
+    retrieve_districts,
+)
+
+FILE_DATE = re.compile(r'(\d{4})-?(\d{2})-?(\d{2})')
+TABLE_DATE = re.compile(r'Stand\W*(\d{1,2})\.(\d{1,2})\.(\d{4})')
+
+
+def read_snapshot(path):
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        return f.read()
+
+
+def get_date(path, page):
+    match = FILE_DATE.search(os.path.basename(path))
+    if match:
+        return '{}-{}-{}'.format(*match.groups())
+    match = TABLE_DATE.search(page.replace('&nbsp;', ' '))
+    if match:
+        day, month, year = match.groups()
+        return '{}-{:0>2}-{:0>2}'.format(year, month, day)
+    raise ValueError('No date found')
+
+
+def parse_snapshot(path):
+    """Returns the path, the day and the row of every file of a snapshot, or
+    the path, None and the error if it could not be parsed."""
+    try:
+        page = read_snapshot(path)
+        day = get_date(path, page)
+        cases, fatalities, hospitalizations, icus, releases = retrieve(page)
+        rows = {
+            FILE_CASES: get_row(FILE_CASES, cases, day),
+            FILE_FATALITIES: get_row(FILE_FATALITIES, fatalities, day),
+            FILE_HOSPITALIZATIONS: get_row(FILE_HOSPITALIZATIONS, hospitalizations, day),
+            FILE_ICUS: get_row(FILE_ICUS, icus, day),
+            FILE_RELEASES: get_row(FILE_RELEASES, releases, day),
+        }
+        districts = retrieve_districts(page)
+        if districts:
+            rows[FILE_DISTRICT_CASES] = get_district_row(districts, day)
+        return path, day, rows
+    except Exception as e:
+        return path, None, e
+
+
+def backfill(directory, workers=None):
+    paths = sorted(
+        glob.glob(os.path.join(directory, '*.html'))
+        + glob.glob(os.path.join(directory, '*.html.gz'))
+    )
+    if not paths:
+        print('No snapshots found in {}'.format(directory))
+        return
+
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    days = {}
+    failed = 0
+    with ProcessPoolExecutor(workers) as executor:
+        chunksize = max(1, len(paths) // (4 * workers))
+        for path, day, result in executor.map(parse_snapshot, paths, chunksize=chunksize):
+            if day is None:
+                print('Skipping {}: {}'.format(os.path.basename(path), result))
+                failed += 1
+            else:
+                # Snapshots are in file name order, the last of a day wins
+                days[day] = result
+    parsed = time.perf_counter() - start
+    if not days:
+        print('None of the {} snapshots could be parsed'.format(len(paths)))
+        return
+
+    rows = {}
+    for day in sorted(days):
+        for filename, row in days[day].items():
+            rows.setdefault(filename, []).append(row)
+    transaction.commit({filename: pd.DataFrame(r) for filename, r in rows.items()})
+    total = time.perf_counter() - start
+
+    print(
+        'Parsed {} snapshots ({} failed) of {} days in {:.2f} s, wrote them in {:.2f} s: {:.1f} days/s'.format(
+            len(paths), failed, len(days), parsed, total - parsed, len(days) / total
+        )
+    )
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argparser.add_argument('directory', help='directory of the archived pages')
+    argparser.add_argument('--workers', type=int, help='defaults to the number of CPUs')
+    args = argparser.parse_args()
+    backfill(args.directory, args.workers)
+
+
+if __name__ == "__main__":
+    main()
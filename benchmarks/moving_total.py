@@ -0,0 +1,69 @@
+"""Compares the cumulative-sum window engine against the row-by-row moving
+total it replaced, at 1x, 10x and 100x the history in data_AT.
+
+    python -m benchmarks.moving_total [--factors 1 10 100] [--legacy-max-factor 10]
+"""
+import argparse
+from configparser import ConfigParser
+from datetime import date, timedelta
+import pandas as pd
+from dashcoch import windows
+from .suite import timed
+from .synthetic import scale_history
+
+
+def legacy_moving_total(df, days=7):
+    offset = days - 1
+    df_moving_total = df[0:0]
+    for i in range(0, len(df)):
+        start = max(0, i - offset)
+        d = pd.Series(df.iloc[start : i + 1].sum().to_dict())
+        d.name = df.index[i]
+        df_moving_total = pd.concat([df_moving_total, d.to_frame().T])
+
+    date_labels = []
+    for d in df_moving_total.index.values:
+        today = date.fromisoformat(d)
+        date_labels.append(
+            (today - timedelta(days=days)).strftime("%d. %m.")
+            + " – "
+            + today.strftime("%d. %m.")
+        )
+
+    df_moving_total["date_label"] = date_labels
+
+    return df_moving_total
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argparser.add_argument("--factors", type=int, nargs="+", default=[1, 10, 100])
+    argparser.add_argument("--legacy-max-factor", type=int, default=100)
+    args = argparser.parse_args()
+
+    parser = ConfigParser()
+    parser.read("settings.ini")
+    cases = pd.read_csv(parser.get("urls", "swiss_cases"))
+
+    print("factor     rows   legacy [s]   vectorized [s]   7/14/28 [s]")
+    for factor in args.factors:
+        diff = scale_history(cases, factor).set_index("Date").diff()
+        fast, totals = timed(windows.moving_total, diff, repeat=5)
+        multi, _ = timed(windows.moving_totals, diff, (7, 14, 28), repeat=5)
+
+        legacy = float("nan")
+        if factor <= args.legacy_max_factor:
+            legacy, expected = timed(legacy_moving_total, diff)
+            pd.testing.assert_frame_equal(
+                totals, expected, check_dtype=False, check_names=False
+            )
+
+        print(
+            "{:>6} {:>8} {:>12.4f} {:>16.4f} {:>13.4f}".format(
+                factor, len(diff), legacy, fast, multi
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Compares the closed form regression of dashcoch.regression against
+scipy.stats.linregress, which it replaced, on the regressions of the
+DataLoader and on random samples from 2 to 10,000 points, and checks that
+they agree to within a relative tolerance. Needs scipy, which the app does
+not; it is installed with requirements-dev.txt, as are the tests.
+
+    python -m benchmarks.regression [--samples 200] [--rtol 1e-9]
+"""
+import argparse
+from configparser import ConfigParser
+import numpy as np
+import pandas as pd
+from dashcoch import DataLoader, regression
+from .suite import timed
+
+FIELDS = ["slope", "intercept", "r_value", "p_value", "std_err"]
+
+
+def loader_inputs():
+    """The x and y values of the regressions of the DataLoader on data_AT."""
+    parser = ConfigParser()
+    parser.read("settings.ini")
+    data = DataLoader(parser, lazy=True)
+    pairs = {
+        "prevalence_density": (
+            data.swiss_demography["Density"],
+            data.swiss_cases_by_date_filled_per_capita.iloc[-1],
+        ),
+        "cfr_age": (
+            data.swiss_demography["O65"],
+            data.swiss_case_fatality_rates.iloc[-1],
+        ),
+    }
+    inputs = {}
+    for name, (x, y) in pairs.items():
+        # As DataLoader.__get_regression
+        df = pd.DataFrame([x, y]).dropna(axis=1, how="any")
+        inputs[name] = (df.iloc[0].values, df.iloc[1].values)
+    return inputs
+
+
+def random_inputs(samples, seed=0):
+    rng = np.random.RandomState(seed)
+    inputs = {}
+    for n in [2, 3, 5, 9, 30, 1000, 10000]:
+        for i in range(samples):
+            x = rng.lognormal(size=n) * 100
+            noise = rng.choice([0.0, 0.01, 1.0, 100.0])
+            y = rng.normal() * x + rng.normal(size=n) * noise * x.std()
+            inputs["random {} #{}".format(n, i)] = (x, y)
+    return inputs
+
+
+def check(name, expected, result, rtol):
+    for field, e, r in zip(FIELDS, expected, result):
+        if np.isnan(e) and np.isnan(r):
+            continue
+        # Below the normal floats, p-values only differ in rounding to zero
+        assert np.isclose(r, e, rtol=rtol, atol=1e-300), "{} {}: {} != {}".format(
+            name, field, r, e
+        )
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argparser.add_argument("--samples", type=int, default=200)
+    argparser.add_argument("--rtol", type=float, default=1e-9)
+    args = argparser.parse_args()
+
+    try:
+        from scipy import stats
+    except ImportError:
+        print("scipy is not installed, see requirements-dev.txt")
+        return
+
+    inputs = {**loader_inputs(), **random_inputs(args.samples)}
+    totals = [0.0, 0.0]
+    for name, (x, y) in inputs.items():
+        legacy, expected = timed(stats.linregress, x, y, repeat=3)
+        fast, result = timed(regression.linregress, x, y, repeat=3)
+        check(name, tuple(expected)[:5], result, args.rtol)
+        totals[0] += legacy
+        totals[1] += fast
+        if not name.startswith("random"):
+            print(
+                "{:<20} r {:.6f}  p-value {:.6f}".format(name, result[2], result[3])
+            )
+    print(
+        "scipy {:.2f} ms, closed form {:.2f} ms: all {} regressions agree".format(
+            totals[0] * 1000, totals[1] * 1000, len(inputs)
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
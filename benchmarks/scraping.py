@@ -0,0 +1,155 @@
+"""Compares the parsers of update_data.py against the full-page parsing they
+replaced, on the saved pages in benchmarks/fixtures, and checks that both
+return the same values. Then fetches a fixture twice from a local server, to
+check and time skipping an unchanged page, with and without ETag support.
+
+    python -m benchmarks.scraping [--repeat 20]
+"""
+import argparse
+import glob
+import os
+import re
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import bs4
+from bs4 import BeautifulSoup
+import update_data
+from .suite import ROOT, timed
+
+FIXTURES = os.path.join(ROOT, "benchmarks", "fixtures")
+
+
+def legacy_retrieve(page):
+    r = page.replace("\n", "").replace("\t", "").replace("&nbsp;", "")
+    soup = BeautifulSoup(r, "html.parser")
+    table = soup.find(attrs={"class": "table-responsive"}).find_next()
+    body = table.find("tbody")
+    rows = body.find_all("tr")
+
+    for row in rows:
+        line = [c for c in row.contents if type(c) == bs4.element.Tag]
+        line_head = line.pop(0)
+
+        if line_head.text.startswith("Bestätigte Fälle"):
+            cases = list(zip(update_data.STATES.keys(), [l.text for l in line]))
+        elif line_head.text.startswith("Todesfälle"):
+            fatalities = list(zip(update_data.STATES.keys(), [l.text for l in line]))
+        elif line_head.text.startswith("Hospitalisierung"):
+            hospitalizations = list(
+                zip(update_data.STATES.keys(), [l.text for l in line])
+            )
+        elif line_head.text.startswith("Intensivstation"):
+            icus = list(zip(update_data.STATES.keys(), [l.text for l in line]))
+        elif line_head.text.startswith("Genesen"):
+            releases = list(zip(update_data.STATES.keys(), [l.text for l in line]))
+
+    return cases, fatalities, hospitalizations, icus, releases
+
+
+def legacy_retrieve_districts(page):
+    r = page.replace("\n", " ").replace("\t", " ").replace("&nbsp;", " ")
+    text = BeautifulSoup(r, "html.parser").get_text(" ")
+
+    districts = []
+    for district in update_data.DISTRICTS:
+        match = re.search(
+            r"(?<![\w-])" + re.escape(district) + r"\s*\((\d[\d.]*)\)", text
+        )
+        if match:
+            districts.append((district, match.group(1)))
+    return districts
+
+
+def serve(page, etag):
+    """Serves ``page`` on a local port, answering conditional requests with
+    304 if ``etag`` is set. Returns the server and its URL."""
+    body = page.encode()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if etag and self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            if etag:
+                self.send_header("ETag", etag)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, "http://127.0.0.1:{}/".format(server.server_address[1])
+
+
+def time_fetch(page, etag, repeat):
+    server, url = serve(page, etag)
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            state_file = os.path.join(directory, "state.json")
+            changed, fetched = timed(update_data.fetch, url, state_file, repeat=repeat)
+            assert fetched is not None and fetched[0] == page
+            update_data.save_state(fetched[1], state_file)
+            unchanged, fetched = timed(
+                update_data.fetch, url, state_file, repeat=repeat
+            )
+            assert fetched is None
+    finally:
+        server.shutdown()
+    return changed, unchanged
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argparser.add_argument("--repeat", type=int, default=20)
+    args = argparser.parse_args()
+
+    parsers = ["html.parser"]
+    if update_data.PARSER != "html.parser":
+        parsers.append(update_data.PARSER)
+
+    print("fixture                        bytes  parser        legacy [ms]  new [ms]")
+    for path in sorted(glob.glob(os.path.join(FIXTURES, "*.html"))):
+        with open(path, encoding="utf-8") as f:
+            page = f.read()
+        name = os.path.basename(path)
+
+        legacy, expected = timed(
+            lambda: (legacy_retrieve(page), legacy_retrieve_districts(page)),
+            repeat=args.repeat,
+        )
+        for parser in parsers:
+            update_data.PARSER = parser
+            new, result = timed(
+                lambda: (
+                    update_data.retrieve(page),
+                    update_data.retrieve_districts(page),
+                ),
+                repeat=args.repeat,
+            )
+            assert result == expected, "{} parsed differently with {}".format(
+                name, parser
+            )
+            print(
+                "{:<28} {:>7}  {:<12} {:>12.2f} {:>9.2f}".format(
+                    name, len(page.encode()), parser, legacy * 1000, new * 1000
+                )
+            )
+
+        for etag in ['"fixture"', None]:
+            changed, unchanged = time_fetch(page, etag, args.repeat)
+            print(
+                "{:<28} fetch {} ETag: changed {:.2f} ms, unchanged {:.2f} ms".format(
+                    name, "with" if etag else "without", changed * 1000, unchanged * 1000
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Compares serializing the layout and the response of every server-side
+callback with dashcoch.serialization.dumps against the plotly JSON encoder
+Dash uses, on a synthetic dataset, and checks that both encode the same
+values: decoded and dumped again without white space, their output has to be
+the same bytes.
+
+    python -m benchmarks.serialization [--factor 10] [--repeat 5]
+"""
+import argparse
+import json
+import os
+import tempfile
+import plotly
+from dashcoch import serialization
+from .suite import ROOT, callback_variants, response, timed
+from .synthetic import write_dataset
+
+
+def legacy_dumps(obj):
+    return json.dumps(obj, cls=plotly.utils.PlotlyJSONEncoder)
+
+
+def canonical(body):
+    return json.dumps(json.loads(body), separators=(",", ":"), ensure_ascii=False)
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argparser.add_argument("--factor", type=int, default=10)
+    argparser.add_argument("--repeat", type=int, default=5)
+    args = argparser.parse_args()
+
+    if serialization.orjson is None:
+        print("orjson is not installed, dumps falls back to the plotly encoder")
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        write_dataset(directory, args.factor, os.path.join(ROOT, "settings.ini"))
+        os.chdir(directory)
+        try:
+            import app
+
+            values = [("_dash-layout", app.app._layout_value())] + [
+                (key, response(callback_id, func(*args_)))
+                for key, callback_id, func, args_ in callback_variants(app.app)
+            ]
+            print("   legacy [ms]   dumps [ms]   legacy bytes   dumps bytes  response")
+            totals = [0.0, 0.0]
+            for key, value in values:
+                legacy, expected = timed(legacy_dumps, value, repeat=args.repeat)
+                fast, body = timed(serialization.dumps, value, repeat=args.repeat)
+                assert canonical(body) == canonical(expected), key
+                totals[0] += legacy
+                totals[1] += fast
+                print(
+                    "{:>14.2f} {:>12.2f} {:>14} {:>13}  {}".format(
+                        legacy * 1000, fast * 1000, len(expected), len(body), key
+                    )
+                )
+            print(
+                "{:>14.2f} {:>12.2f}  all {} responses equivalent".format(
+                    totals[0] * 1000, totals[1] * 1000, len(values)
+                )
+            )
+        finally:
+            os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Reports the cold start of app.py in a fresh process: the time spent
+importing each package and running app.py itself, including building the
+DataLoader and the layout, and checks it against a budget.
+
+    python -m benchmarks.startup [--factor 10] [--budget 1.5] [--top 12]
+
+Without --factor, the app is started on data_AT as configured in
+settings.ini, otherwise on a synthetic dataset of that size. With --budget,
+the exit status is 1 if importing app.py took longer than that many seconds.
+The layout is built while importing, when Dash validates the callbacks, and
+timed by building it once more afterwards.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from .suite import ROOT
+from .synthetic import write_dataset
+
+CHILD = """
+import json, time
+start = time.perf_counter()
+import app
+total = time.perf_counter() - start
+start = time.perf_counter()
+app.app._layout_value()
+layout = time.perf_counter() - start
+print(json.dumps({
+    "total": total,
+    "loader": app.refresher.build_seconds,
+    "layout": layout,
+}))
+"""
+
+
+def parse_importtime(output, module="app"):
+    """Seconds spent importing ``module``, in its own body and in the
+    packages it imported, from the output of ``python -X importtime``."""
+    lines = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        own, _, name = line[len("import time:") :].split("|")
+        # Indented by two spaces per level, after one separating space
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        lines.append((name.strip(), depth, int(own) / 1e6))
+
+    # Nested imports are listed before the module importing them
+    end = max(
+        i for i, (name, depth, _) in enumerate(lines) if name == module and depth == 0
+    )
+    start = end
+    while start > 0 and lines[start - 1][1] > 0:
+        start -= 1
+
+    packages = {}
+    for name, _, seconds in lines[start : end + 1]:
+        package = name.split(".")[0]
+        packages[package] = packages.get(package, 0.0) + seconds
+    return packages
+
+
+def measure(directory):
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD],
+        cwd=directory,
+        env=dict(os.environ, PYTHONPATH=ROOT),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    result = json.loads(process.stdout.strip().splitlines()[-1])
+    result["packages"] = parse_importtime(process.stderr)
+    return result
+
+
+def report(result, top):
+    packages = dict(result["packages"])
+    own = packages.pop("app")
+    print("Importing app.py took {:.3f} s".format(result["total"]))
+    print(
+        "{:>10.1f} ms  importing {} packages, of which".format(
+            sum(packages.values()) * 1000, len(packages)
+        )
+    )
+    for name, seconds in sorted(packages.items(), key=lambda p: -p[1])[:top]:
+        print("{:>24.1f} ms  {}".format(seconds * 1000, name))
+    print("{:>10.1f} ms  running app.py, including".format(own * 1000))
+    print("{:>24.1f} ms  building the DataLoader".format(result["loader"] * 1000))
+    print("{:>24.1f} ms  building the layout".format(result["layout"] * 1000))
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argparser.add_argument("--factor", type=int, help="size of a synthetic dataset")
+    argparser.add_argument("--budget", type=float, help="seconds")
+    argparser.add_argument("--top", type=int, default=12)
+    args = argparser.parse_args()
+
+    if args.factor is None:
+        result = measure(ROOT)
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            write_dataset(directory, args.factor, os.path.join(ROOT, "settings.ini"))
+            result = measure(directory)
+    report(result, args.top)
+
+    if args.budget is not None and result["total"] > args.budget:
+        print("Over the budget of {:.3f} s".format(args.budget))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+"""Times building the DataLoader stage by stage, and the layout and every
+server-side callback of app.py together with the serialization of their
+responses, on synthetic datasets at 1x, 10x and 100x the history in data_AT.
+
+    python -m benchmarks.suite [--factors 1 10 100] [--compare REF]
+
+Each factor runs in a fresh process started in a temporary directory holding
+the dataset. The results are written to benchmarks/results/<commit>.json. With
+--compare, they are compared to an earlier result, given as a commit or a
+file, and timings that got slower by more than --threshold are listed.
+"""
+import argparse
+import inspect
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from configparser import ConfigParser
+from datetime import datetime
+from .synthetic import write_dataset
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS = os.path.join(ROOT, "benchmarks", "results")
+
+# Input values that cannot be taken from the layout
+DEFAULTS = {}
+
+
+def timed(func, *args, repeat=1):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def time_loader(parser, repeat):
+    """Seconds spent reading the sources and computing each derived attribute,
+    in definition order, so every stage only computes itself."""
+    from dashcoch import DataLoader
+    from dashcoch.derived import derived_attributes
+
+    stages = {}
+    for _ in range(repeat):
+        start = time.perf_counter()
+        loader = DataLoader(parser, lazy=True)
+        times = {"sources": time.perf_counter() - start}
+        for name in derived_attributes(DataLoader):
+            start = time.perf_counter()
+            getattr(loader, name)
+            times[name] = time.perf_counter() - start
+        for name, seconds in times.items():
+            stages[name] = min(stages.get(name, float("inf")), seconds)
+    stages["total"] = sum(stages.values())
+    return stages
+
+
+def time_layout(app, repeat):
+    """Seconds spent building and serializing the layout, which holds the
+    data of the default view."""
+    from dashcoch import serialization
+
+    app._layout_value()  # computes lazily derived attributes
+    compute, layout = timed(app._layout_value, repeat=repeat)
+    serialize, body = timed(serialization.dumps, layout, repeat=repeat)
+    return {"compute": compute, "serialize": serialize, "bytes": len(body)}
+
+
+def callback_variants(app):
+    """Yields a key, the output ID, the undecorated function and the
+    arguments of every server-side callback, once for every option of the
+    radio items among its inputs."""
+    layout = app.layout() if callable(app.layout) else app.layout
+    components = {
+        component.id: component
+        for component in layout._traverse()
+        if getattr(component, "id", None) is not None
+    }
+
+    for callback_id, callback in app.callback_map.items():
+        if "callback" not in callback:
+            continue
+        # Bypass Dash's serialization and any response cache
+        func = inspect.unwrap(callback["callback"])
+        for variant, args in _variants(callback["inputs"], components):
+            key = callback_id if variant is None else callback_id + "|" + variant
+            yield key, callback_id, func, args
+
+
+def time_callbacks(app, repeat):
+    """Seconds spent in each server-side callback and in serializing its
+    response, for every option of the radio items among its inputs."""
+    from dashcoch import serialization
+
+    results = {}
+    for key, callback_id, func, args in callback_variants(app):
+        func(*args)  # computes lazily derived attributes
+        compute, value = timed(func, *args, repeat=repeat)
+        serialize, body = timed(
+            serialization.dumps, response(callback_id, value), repeat=repeat
+        )
+        results[key] = {
+            "compute": compute,
+            "serialize": serialize,
+            "bytes": len(body),
+        }
+    return results
+
+
+def _variants(inputs, components):
+    args = []
+    radio = None
+    for i, dependency in enumerate(inputs):
+        component = components.get(dependency["id"])
+        value = DEFAULTS.get(
+            (dependency["id"], dependency["property"]),
+            getattr(component, dependency["property"], None),
+        )
+        args.append(value)
+        if component is not None and component._type == "RadioItems":
+            radio = (i, [option["value"] for option in component.options])
+
+    if radio is None:
+        yield None, args
+        return
+    i, values = radio
+    for value in values:
+        yield str(value), args[:i] + [value] + args[i + 1 :]
+
+
+def response(callback_id, value):
+    """The response Dash sends for the return value of a callback."""
+    if callback_id.startswith(".."):
+        outputs = callback_id[2:-2].split("...")
+        response = {"response": {}, "multi": True}
+        for output, output_value in zip(outputs, value):
+            component_id, prop = output.rsplit(".", 1)
+            response["response"].setdefault(component_id, {})[prop] = output_value
+        return response
+    return {"response": {"props": {callback_id.rsplit(".", 1)[1]: value}}}
+
+
+def run(repeat):
+    """Runs the benchmarks in the current directory, which has to hold a
+    dataset written by ``write_dataset``."""
+    parser = ConfigParser()
+    parser.read("settings.ini")
+    loader = time_loader(parser, repeat)
+
+    start = time.perf_counter()
+    import app
+
+    startup = time.perf_counter() - start
+    return {
+        "rows": len(app.get_data().swiss_cases),
+        "startup": startup,
+        "loader": loader,
+        "callbacks": {
+            "_dash-layout": time_layout(app.app, repeat),
+            **time_callbacks(app.app, repeat),
+        },
+    }
+
+
+def commit():
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def flatten(results):
+    """Maps ``factor/section/name[/part]`` to seconds."""
+    timings = {}
+    for factor, result in results["factors"].items():
+        timings["{}/startup".format(factor)] = result["startup"]
+        for name, seconds in result["loader"].items():
+            timings["{}/loader/{}".format(factor, name)] = seconds
+        for name, parts in result["callbacks"].items():
+            for part in ("compute", "serialize"):
+                timings["{}/callbacks/{}/{}".format(factor, name, part)] = parts[part]
+    return timings
+
+
+def compare(results, reference, threshold, minimum=0.001):
+    """Prints the timings that are slower than in ``reference`` by more than
+    ``threshold`` (e.g. 0.2 for 20%), ignoring ones below ``minimum``
+    seconds."""
+    old, new = flatten(reference), flatten(results)
+    slower = [
+        (new[key] / old[key], key)
+        for key in sorted(set(old) & set(new))
+        if max(old[key], new[key]) >= minimum and new[key] > old[key] * (1 + threshold)
+    ]
+    print(
+        "\nCompared to {}: {} of {} timings slower by more than {:.0%}".format(
+            reference["commit"], len(slower), len(set(old) & set(new)), threshold
+        )
+    )
+    for ratio, key in sorted(slower, reverse=True):
+        print("{:>8.2f}x  {:.4f} -> {:.4f} s  {}".format(ratio, old[key], new[key], key))
+    return slower
+
+
+def report(results):
+    for factor, result in results["factors"].items():
+        print("\n{}x ({} rows), startup {:.3f} s".format(factor, result["rows"], result["startup"]))
+        print("  DataLoader [ms]")
+        for name, seconds in result["loader"].items():
+            print("  {:>10.2f}  {}".format(seconds * 1000, name))
+        print("  Callbacks [ms]   compute  serialize      bytes")
+        for name, parts in result["callbacks"].items():
+            print(
+                "  {:>24.2f} {:>10.2f} {:>10}  {}".format(
+                    parts["compute"] * 1000, parts["serialize"] * 1000, parts["bytes"], name
+                )
+            )
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argparser.add_argument("--factors", type=int, nargs="+", default=[1, 10, 100])
+    argparser.add_argument("--repeat", type=int, default=3)
+    argparser.add_argument("--compare", help="commit or result file to compare to")
+    argparser.add_argument("--threshold", type=float, default=0.2)
+    argparser.add_argument("--output", help="defaults to benchmarks/results/<commit>.json")
+    argparser.add_argument("--run", action="store_true", help=argparse.SUPPRESS)
+    args = argparser.parse_args()
+
+    if args.run:
+        with open(args.output, "w") as f:
+            json.dump(run(args.repeat), f)
+        return
+
+    results = {
+        "commit": commit(),
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "factors": {},
+    }
+    for factor in args.factors:
+        with tempfile.TemporaryDirectory() as directory:
+            write_dataset(directory, factor, os.path.join(ROOT, "settings.ini"))
+            output = os.path.join(directory, "results.json")
+            subprocess.run(
+                [
+                    sys.executable,
+                    "-m",
+                    "benchmarks.suite",
+                    "--run",
+                    "--repeat",
+                    str(args.repeat),
+                    "--output",
+                    output,
+                ],
+                cwd=directory,
+                env=dict(os.environ, PYTHONPATH=ROOT),
+                stdout=subprocess.DEVNULL,
+                check=True,
+            )
+            with open(output) as f:
+                results["factors"][str(factor)] = json.load(f)
+
+    report(results)
+    path = args.output or os.path.join(RESULTS, results["commit"] + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(results, f, indent=1)
+    print("\nWritten to {}".format(path))
+
+    if args.compare:
+        reference = args.compare
+        if not os.path.exists(reference):
+            reference = os.path.join(RESULTS, reference + ".json")
+        with open(reference) as f:
+            compare(results, json.load(f), args.threshold)
+
+
+if __name__ == "__main__":
+    main()
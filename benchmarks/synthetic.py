@@ -0,0 +1,114 @@
+import os
+import shutil
+from configparser import ConfigParser
+import numpy as np
+import pandas as pd
+from dashcoch import columnar
+from dashcoch.data_loader import SOURCES
+from dashcoch.districts import DISTRICTS
+
+
+def scale_history(df: pd.DataFrame, factor: int):
+    """Stretches a frame in the data_AT CSV schema to ``factor`` times its
+    length. The rows are repeated on consecutive days after the last date and
+    offset by the running total, so cumulative series keep growing."""
+    values = df.drop(columns=["Date"])
+    last = values.fillna(method="ffill").iloc[-1].fillna(0)
+    tiles = [values + last * i for i in range(factor)]
+    scaled = pd.concat(tiles, ignore_index=True)
+    dates = pd.date_range(df["Date"].iloc[0], periods=len(scaled), freq="D")
+    scaled.insert(0, "Date", np.array(dates.strftime("%Y-%m-%d"), dtype=object))
+    return scaled
+
+
+WORLD_COUNTRIES = [
+    "France",
+    "Germany",
+    "Italy",
+    "Korea, South",
+    "Spain",
+    "US",
+    "United Kingdom",
+    "Switzerland",
+    "Austria",
+]
+
+
+def world_series(days: int, seed: int = 0):
+    """A frame in the schema of the JHU global time series, with a growing
+    cumulative count per country over ``days`` days."""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2020-01-22", periods=days, freq="D")
+    counts = rng.poisson(100, (len(WORLD_COUNTRIES), days)).cumsum(axis=1)
+    df = pd.DataFrame(
+        counts, columns=["{}/{}/{}".format(d.month, d.day, d.year % 100) for d in dates]
+    )
+    df.insert(0, "Long", 0.0)
+    df.insert(0, "Lat", 0.0)
+    df.insert(0, "Country/Region", WORLD_COUNTRIES)
+    df.insert(0, "Province/State", "")
+    return df
+
+
+def district_series(cases: pd.DataFrame, seed: int = 0):
+    """A frame in the schema of the district CSV, splitting the cases of every
+    state in ``cases`` among its districts by fixed random weights."""
+    rng = np.random.default_rng(seed)
+    states = pd.Series(DISTRICTS)
+    weights = pd.Series(rng.random(len(states)), index=states.index)
+    weights /= weights.groupby(states).transform("sum")
+    df = pd.DataFrame(
+        np.floor(cases[states.values].values * weights.values), columns=states.index
+    )
+    df.insert(0, "Date", cases["Date"].values)
+    return df
+
+
+def write_dataset(directory: str, factor: int, settings: str = "settings.ini"):
+    """Writes the data_AT files scaled to ``factor`` times their history, their
+    binary copies, synthetic district and world series and a settings.ini pointing at them
+    to ``directory``. The app can then be started from there, offline."""
+    parser = ConfigParser()
+    parser.read(settings)
+    root = os.path.dirname(os.path.abspath(settings))
+    data = os.path.join(directory, "data_AT")
+    os.makedirs(data, exist_ok=True)
+
+    for name in SOURCES:
+        source = os.path.join(root, parser.get("urls", name))
+        path = os.path.join(data, os.path.basename(source))
+        df = scale_history(pd.read_csv(source), factor)
+        df.to_csv(path, index=False)
+        columnar.write(pd.read_csv(path), path)
+        if name == "swiss_cases":
+            days = len(df)
+            cases = df
+        parser.set("urls", name, os.path.relpath(path, directory))
+
+    path = os.path.join(data, "covid19_cases_districts_austria.csv")
+    district_series(cases).to_csv(path, index=False)
+    columnar.write(pd.read_csv(path), path)
+    parser.set("urls", "district_cases", os.path.relpath(path, directory))
+
+    demography = os.path.join(root, parser.get("urls", "swiss_demography"))
+    shutil.copy(demography, data)
+    parser.set(
+        "urls", "swiss_demography", os.path.join("data_AT", os.path.basename(demography))
+    )
+
+    for i, name in enumerate(["world_cases", "world_fatalities"]):
+        path = os.path.join(directory, name + ".csv")
+        world_series(days, seed=i).to_csv(path, index=False)
+        parser.set("urls", name, name + ".csv")
+
+    parser.set("data", "refresh_interval", "0")
+    parser.set("cache", "directory", ".cache")
+    parser.set("shared", "directory", "")
+    if parser.has_section("geometry"):
+        # Shares the built geometry of the checkout
+        for option in ("source", "directory"):
+            parser.set(
+                "geometry", option, os.path.join(root, parser.get("geometry", option))
+            )
+    with open(os.path.join(directory, "settings.ini"), "w") as f:
+        parser.write(f)
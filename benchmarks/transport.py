@@ -0,0 +1,164 @@
+"""Compares the payloads of the caseincrease-cantonal data store: the two
+``DataFrame.to_json`` strings it used to send, the columnar arrays it sends
+now, and the same arrays as base64 encoded float32 typed arrays. Sizes are
+measured raw and gzipped, parse times in Python and, if node is on the path,
+in a JavaScript engine, including the re-keying the old format needed.
+
+    python -m benchmarks.transport [--factors 1 10 100]
+"""
+import argparse
+import base64
+import gzip
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+from configparser import ConfigParser
+import numpy as np
+import plotly
+from dashcoch import DataLoader
+from .suite import ROOT, timed
+from .synthetic import write_dataset
+
+NODE_SCRIPT = r"""
+const fs = require("fs")
+const payloads = JSON.parse(fs.readFileSync(process.argv[1]))
+const repeat = 20
+
+function legacy(text) {
+  const data_raw = JSON.parse(text)
+  const data = { swiss_cases_by_date_filled: {}, moving_total: [] }
+  for (const name of ["swiss_cases_by_date_filled", "moving_total"]) {
+    for (const key in data_raw[name]) {
+      if (data_raw[name].hasOwnProperty(key)) {
+        const values = []
+        for (const subkey in data_raw[name][key]) {
+          if (data_raw[name][key].hasOwnProperty(subkey)) {
+            values.push(data_raw[name][key][subkey])
+          }
+        }
+        data[name][key] = values
+      }
+    }
+  }
+  return data
+}
+
+function typed(text) {
+  const data = JSON.parse(text)
+  for (const name of ["swiss_cases_by_date_filled", "moving_total"]) {
+    for (const key in data[name]) {
+      const bytes = Buffer.from(data[name][key], "base64")
+      data[name][key] = new Float32Array(bytes.buffer, bytes.byteOffset, bytes.length / 4)
+    }
+  }
+  return data
+}
+
+const parsers = { legacy: legacy, columnar: JSON.parse, typed: typed }
+const result = {}
+for (const name in payloads) {
+  let best = Infinity
+  for (let i = 0; i < repeat; i++) {
+    const start = process.hrtime.bigint()
+    parsers[name](payloads[name])
+    best = Math.min(best, Number(process.hrtime.bigint() - start) / 1e9)
+  }
+  result[name] = best
+}
+console.log(JSON.stringify(result))
+"""
+
+
+def legacy_payload(data):
+    return (
+        '{"swiss_cases_by_date_filled": '
+        + data.swiss_cases_by_date_filled.to_json(date_format="iso", orient="columns")
+        + ', "moving_total":'
+        + data.moving_total.to_json(date_format="iso", orient="columns")
+        + "}"
+    )
+
+
+def columnar_payload(data):
+    from app import get_caseincrease_cantonal_data
+
+    return json.dumps(
+        get_caseincrease_cantonal_data(data), cls=plotly.utils.PlotlyJSONEncoder
+    )
+
+
+def typed_payload(data):
+    def encode(values):
+        return base64.b64encode(np.asarray(values, dtype="<f4").tobytes()).decode()
+
+    payload = json.loads(columnar_payload(data))
+    cantons = payload["states"]
+    for name, df in [
+        ("swiss_cases_by_date_filled", data.swiss_cases_by_date_filled),
+        ("moving_total", data.moving_total),
+    ]:
+        payload[name] = {canton: encode(df[canton].values) for canton in cantons}
+    return json.dumps(payload)
+
+
+def node_parse_times(payloads):
+    node = shutil.which("node")
+    if node is None:
+        return {}
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "payloads.json")
+        with open(path, "w") as f:
+            json.dump(payloads, f)
+        output = subprocess.run(
+            [node, "-e", NODE_SCRIPT, path],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+    return json.loads(output)
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argparser.add_argument("--factors", type=int, nargs="+", default=[1, 10, 100])
+    args = argparser.parse_args()
+
+    cwd = os.getcwd()
+    print(
+        "factor  format         bytes    gzipped  json.loads [ms]  node [ms]"
+    )
+    for factor in args.factors:
+        with tempfile.TemporaryDirectory() as directory:
+            write_dataset(directory, factor, os.path.join(ROOT, "settings.ini"))
+            os.chdir(directory)
+            try:
+                parser = ConfigParser()
+                parser.read("settings.ini")
+                data = DataLoader(parser, lazy=True)
+                payloads = {
+                    "legacy": legacy_payload(data),
+                    "columnar": columnar_payload(data),
+                    "typed": typed_payload(data),
+                }
+            finally:
+                os.chdir(cwd)
+
+        node = node_parse_times(payloads)
+        for name, payload in payloads.items():
+            parse, _ = timed(json.loads, payload, repeat=5)
+            print(
+                "{:>6}  {:<10} {:>10} {:>10} {:>16.2f} {:>10}".format(
+                    factor,
+                    name,
+                    len(payload),
+                    len(gzip.compress(payload.encode())),
+                    parse * 1000,
+                    "{:.2f}".format(node[name] * 1000) if name in node else "-",
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
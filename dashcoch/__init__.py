@@ -1,2 +1,5 @@
 from .data_loader import DataLoader
 from .style_loader import StyleLoader
+from .refresher import DataRefresher
+from .figure_cache import FigureCache
+from .metrics import Metrics
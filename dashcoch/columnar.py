@@ -0,0 +1,98 @@
+import json
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+
+
+def path_for(csv_path: str):
+    """Directory holding the binary copy of a data_AT CSV."""
+    directory, name = os.path.split(csv_path)
+    return os.path.join(directory, "columnar", os.path.splitext(name)[0])
+
+
+def write(df: pd.DataFrame, csv_path: str):
+    """Writes a binary copy of a frame in the data_AT CSV schema, after the
+    CSV itself has been written.
+
+    The dates are stored as ``datetime64[D]`` and the metric columns as one
+    float64 matrix, both as plain .npy files. The JSON file written last
+    records the column types and the size and mtime of the CSV, which is how
+    readers tell whether the copy is fresh.
+    """
+    path = path_for(csv_path)
+    os.makedirs(path, exist_ok=True)
+    columns = [column for column in df.columns if column != "Date"]
+    _save(os.path.join(path, "dates.npy"), np.array(df["Date"], dtype="datetime64[D]"))
+    _save(os.path.join(path, "values.npy"), df[columns].values.astype(float))
+
+    stat = os.stat(csv_path)
+    meta = {
+        "columns": columns,
+        "dtypes": [str(df[column].dtype) for column in columns],
+        "rows": len(df),
+        "source_size": stat.st_size,
+        "source_mtime": stat.st_mtime_ns,
+    }
+    _replace(os.path.join(path, "meta.json"), "w", lambda f: json.dump(meta, f))
+
+
+def read(csv_path: str, mmap: bool = False):
+    """Reads the binary copy of a data_AT CSV into the frame ``pd.read_csv``
+    would return. Returns None if there is no copy or it is older than the
+    CSV.
+
+    The gain over ``pd.read_csv`` is not parsing text. The frame does not
+    share memory with the files, as its dates are strings and each column is
+    copied to its own type, so memory-mapping them with ``mmap`` saves no
+    memory and is slower on files this small."""
+    path = path_for(csv_path)
+    try:
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        stat = os.stat(csv_path)
+    except (OSError, ValueError):
+        return None
+    if (stat.st_size, stat.st_mtime_ns) != (
+        meta["source_size"],
+        meta["source_mtime"],
+    ):
+        return None
+
+    mmap_mode = "r" if mmap else None
+    try:
+        dates = np.load(os.path.join(path, "dates.npy"), mmap_mode=mmap_mode)
+        values = np.load(os.path.join(path, "values.npy"), mmap_mode=mmap_mode)
+    except (OSError, ValueError):
+        return None
+    if len(dates) != meta["rows"] or values.shape != (meta["rows"], len(meta["columns"])):
+        return None
+
+    columns = {"Date": np.datetime_as_string(dates, unit="D").astype(object)}
+    for i, (column, dtype) in enumerate(zip(meta["columns"], meta["dtypes"])):
+        columns[column] = values[:, i].astype(dtype, copy=False)
+    return pd.DataFrame(columns)
+
+
+def load(csv_path: str):
+    """Reads a data_AT CSV, from its binary copy when that is fresh."""
+    df = read(csv_path)
+    if df is None:
+        df = pd.read_csv(csv_path)
+    return df
+
+
+def _save(path, array):
+    _replace(path, "wb", lambda f: np.save(f, array))
+
+
+def _replace(path, mode, write):
+    # Unique per writer, as update_data and backfill may write the same copy
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode) as f:
+            write(f)
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
@@ -1,203 +1,681 @@
+import copy
+import hashlib
+import math
+import os
 from configparser import ConfigParser
-from datetime import date, datetime, timedelta
+from datetime import date, datetime
 import numpy as np
 import pandas as pd
 from pytz import timezone
-from scipy import stats
+from .derived import derived, derived_attributes, dependents
+from .world_cache import WorldCache
+from . import columnar, districts, regression, transaction, windows
+
+
+SOURCES = [
+    "swiss_cases",
+    "swiss_fatalities",
+    "swiss_hospitalizations",
+    "swiss_icu",
+    "swiss_releases",
+]
+
+# Sources the dashboard works without, and the empty frame standing in for a
+# missing file
+OPTIONAL_SOURCES = {"district_cases": districts.empty_frame}
+
+
+def data_version(parser: ConfigParser):
+    """Cheap fingerprint of the local source files, taken from their sizes and
+    modification times. Returns None if a file is missing, unless it is an
+    optional one, or while ``update_data`` is writing them."""
+    return _fingerprint(parser, source_stats(parser))
+
+
+def source_stats(parser: ConfigParser):
+    """The size and modification time of each local source file by name, or
+    None like ``data_version``. Missing optional files are left out."""
+    if transaction.in_progress(parser.get("urls", "swiss_cases")):
+        return None
+    stats = {}
+    for name in SOURCES + ["swiss_demography"] + list(OPTIONAL_SOURCES):
+        try:
+            stat = os.stat(parser.get("urls", name, fallback=None))
+        except (OSError, TypeError):
+            if name in OPTIONAL_SOURCES:
+                continue
+            return None
+        stats[name] = (stat.st_size, stat.st_mtime_ns)
+    return stats
+
+
+def _fingerprint(parser, stats):
+    if stats is None:
+        return None
+    files = [(parser.get("urls", name),) + stat for name, stat in stats.items()]
+    return hashlib.sha1(repr(files).encode()).hexdigest()[:12]
+
+
+def _splice(old, new, compute, since, lookback=0, reach=0):
+    """Recomputes the rows of ``old`` from ``since`` on by applying ``compute``
+    to the tail of ``new``, the updated frame ``old`` is derived from.
+
+    ``compute`` needs ``lookback`` rows of context before the first row it
+    returns correctly, and a change at ``since`` also affects the ``reach``
+    rows before it (e.g. a centred rolling mean)."""
+    keep = max(0, new.index.searchsorted(since) - reach)
+    if keep >= len(new):
+        return old[old.index < since]
+    cut = new.index[keep]
+    tail = compute(new.iloc[max(0, keep - lookback) :])
+    return pd.concat([old[old.index < cut], tail[tail.index >= cut]])
+
+
+def _splice_filled(old, new, since):
+    """Forward fills the rows of ``new`` from ``since`` on, seeded with the last
+    filled row of ``old`` before them."""
+    keep = new.index.searchsorted(since)
+    seed = old.iloc[max(0, keep - 1) : keep]
+    tail = pd.concat([seed, new.iloc[keep:]]).fillna(method="ffill")
+    return pd.concat([old.iloc[: keep - len(seed)], tail])
+
+
+def _splice_lists(old, new, compute, since):
+    """Recomputes the values of ``old``, lists by column as returned by
+    ``to_dict("list")``, from the row of ``new`` dated ``since`` on by
+    applying ``compute`` to the tail of ``new``."""
+    keep = int(new["Date"].searchsorted(since))
+    tail = compute(new.iloc[keep:])
+    return {column: old[column][:keep] + tail[column] for column in old}
+
 
 class DataLoader:
-    def __init__(self, parser: ConfigParser):
-        self.swiss_cases = pd.read_csv(parser.get("urls", "swiss_cases"))
-        self.swiss_fatalities = pd.read_csv(parser.get("urls", "swiss_fatalities"))
-        self.swiss_hospitalizations = pd.read_csv(
+    def __init__(self, parser: ConfigParser, lazy: bool = False):
+        # Taken before reading, so a file written meanwhile triggers a reload
+        stats = source_stats(parser)
+        self.__setup(parser, lazy, _fingerprint(parser, stats))
+        self.stats = stats
+        self.swiss_cases = columnar.load(parser.get("urls", "swiss_cases"))
+        self.swiss_fatalities = columnar.load(parser.get("urls", "swiss_fatalities"))
+        self.swiss_hospitalizations = columnar.load(
             parser.get("urls", "swiss_hospitalizations")
         )
-        self.swiss_icu = pd.read_csv(parser.get("urls", "swiss_icu"))
-        self.swiss_releases = pd.read_csv(parser.get("urls", "swiss_releases"))
-        
+        self.swiss_icu = columnar.load(parser.get("urls", "swiss_icu"))
+        self.swiss_releases = columnar.load(parser.get("urls", "swiss_releases"))
+        self.district_cases = self.__load_source("district_cases")
+
         self.swiss_demography = pd.read_csv(
             parser.get("urls", "swiss_demography"), index_col=0
         )
-        self.world_cases = self.__simplify_world_data(
-            pd.read_csv(parser.get("urls", "world_cases"))
-        )
-        self.world_fataltities = self.__simplify_world_data(
-            pd.read_csv(parser.get("urls", "world_fatalities"))
+
+        # Every other attribute is derived from the frames above and computed
+        # on first access. Unless lazy, compute them up front, except the
+        # deferred ones.
+        if not lazy:
+            self.__build()
+
+    @classmethod
+    def from_frames(cls, parser: ConfigParser, version: str, frames: dict):
+        """Creates a lazy loader on frames computed elsewhere, e.g. attached
+        from a shared snapshot. ``frames`` has to contain the sources; any
+        derived attribute missing from it is computed on first access."""
+        loader = cls.__new__(cls)
+        loader.__setup(parser, True, version)
+        loader.stats = None
+        loader.__dict__.update(frames)
+        return loader
+
+    def __setup(self, parser, lazy, version):
+        self.parser = parser
+        self.lazy = lazy
+        self.version = version
+        self.world_cache = WorldCache(
+            parser.get("cache", "directory", fallback=".cache"),
+            max_age=parser.getfloat("cache", "world_max_age", fallback=3600),
         )
         self.world_population = self.__get_world_population()
+        self.cantonal_centres = self.__get_cantonal_centres()
 
-        self.swiss_cases_by_date = self.swiss_cases.set_index("Date")
-        self.swiss_fatalities_by_date = self.swiss_fatalities.set_index("Date")
-        self.swiss_hospitalizations_by_date = self.swiss_hospitalizations.set_index(
-            "Date"
+    def __load_source(self, name):
+        path = self.parser.get("urls", name, fallback=None)
+        if name in OPTIONAL_SOURCES and (path is None or not os.path.exists(path)):
+            return OPTIONAL_SOURCES[name]()
+        return columnar.load(path)
+
+    def __build(self):
+        for name, attribute in derived_attributes(type(self)).items():
+            if not attribute.deferred:
+                getattr(self, name)
+
+    def invalidate(self, *names):
+        """Drops the memoized values depending on the given attributes, so
+        they are recomputed from the current sources on next access."""
+        for name in dependents(type(self), names):
+            if name in derived_attributes(type(self)):
+                self.__dict__.pop(name, None)
+
+    def extend(self, **rows):
+        """Adds newly written rows to the source frames, e.g.
+        ``extend(swiss_cases=df)`` with ``df`` in the CSV schema.
+
+        Rows replace existing rows of the same date. The ffill, diff, rolling,
+        per-capita, case fatality rate and moving total series that are
+        already computed are updated from the first changed date on; the
+        cheaper summaries depending on them are recomputed on next access.
+        """
+        since = {}
+        for name, new_rows in rows.items():
+            if len(new_rows) == 0:
+                continue
+            old = self.__dict__[name]
+            new_rows = new_rows[old.columns]
+            self.__dict__[name] = (
+                pd.concat([old[~old["Date"].isin(new_rows["Date"])], new_rows])
+                .sort_values("Date", kind="mergesort")
+                .reset_index(drop=True)
+            )
+            since[name] = new_rows["Date"].min()
+
+        if since:
+            self.version = hashlib.sha1(
+                (str(self.version) + repr(sorted(since.items()))).encode()
+            ).hexdigest()[:12]
+
+        affected = {name: dependents(type(self), [name]) for name in since}
+
+        # Definition order is dependency order, so the inputs of each
+        # extender have already been updated
+        for name, attribute in derived_attributes(type(self)).items():
+            changed = [since[s] for s in since if name in affected[s]]
+            if not changed or name not in self.__dict__:
+                continue
+            if attribute.extend is None:
+                del self.__dict__[name]
+            else:
+                self.__dict__[name] = attribute.extend(
+                    self, self.__dict__[name], min(changed)
+                )
+
+        if not self.lazy:
+            self.__build()
+
+    def refreshed(self):
+        """Returns a new loader on the current source files, extended from a
+        copy of this one with the rows appended since it was read, which are
+        read from the end of the files only. Returns None if the files were
+        changed in any other way, which takes a full build. This loader is
+        left as it is."""
+        stats = source_stats(self.parser)
+        if stats is None or self.stats is None or stats.keys() != self.stats.keys():
+            return None
+        if stats["swiss_demography"] != self.stats["swiss_demography"]:
+            return None
+        rows = {}
+        for name in SOURCES + list(OPTIONAL_SOURCES):
+            if name in stats and stats[name] != self.stats[name]:
+                rows[name] = transaction.appended(
+                    self.parser.get("urls", name), self.stats[name], stats[name]
+                )
+                if rows[name] is None:
+                    return None
+
+        loader = copy.copy(self)
+        loader.lazy = False
+        loader.extend(**rows)
+        loader.version = _fingerprint(self.parser, stats)
+        loader.stats = stats
+        return loader
+
+    @derived(deferred=True)
+    def world_cases(self):
+        return self.world_cache.load(
+            self.parser.get("urls", "world_cases"), self.__simplify_world_data
         )
 
-        self.swiss_cases_by_date_filled = self.swiss_cases_by_date.fillna(
-            method="ffill", axis=0
+    @derived(deferred=True)
+    def world_fataltities(self):
+        return self.world_cache.load(
+            self.parser.get("urls", "world_fatalities"), self.__simplify_world_data
         )
 
-        self.swiss_cases_by_date_diff = self.swiss_cases_by_date_filled.diff().replace(
-            0, float("nan")
-        )
-        self.swiss_cases_by_date_diff["date_label"] = [
-            date.fromisoformat(d).strftime("%d. %m.")
-            for d in self.swiss_cases_by_date_diff.index.values
-        ]
-        
-        self.swiss_fatalities_by_date_diff = self.swiss_fatalities_by_date.diff().replace(
-            0, float("nan")
-        )
-        
-        self.swiss_hospitalizations_by_date_diff = self.swiss_hospitalizations_by_date.diff().replace(
-            0, float("nan")
+    @derived("swiss_cases")
+    def swiss_cases_by_date(self):
+        return self.swiss_cases.set_index("Date")
+
+    @swiss_cases_by_date.extender
+    def swiss_cases_by_date(self, old, since):
+        return self.__splice_by_date(old, self.swiss_cases, since)
+
+    @derived("swiss_fatalities")
+    def swiss_fatalities_by_date(self):
+        return self.swiss_fatalities.set_index("Date")
+
+    @swiss_fatalities_by_date.extender
+    def swiss_fatalities_by_date(self, old, since):
+        return self.__splice_by_date(old, self.swiss_fatalities, since)
+
+    @derived("swiss_hospitalizations")
+    def swiss_hospitalizations_by_date(self):
+        return self.swiss_hospitalizations.set_index("Date")
+
+    @swiss_hospitalizations_by_date.extender
+    def swiss_hospitalizations_by_date(self, old, since):
+        return self.__splice_by_date(old, self.swiss_hospitalizations, since)
+
+    @derived("swiss_cases_by_date")
+    def swiss_cases_by_date_filled(self):
+        return self.swiss_cases_by_date.fillna(method="ffill", axis=0)
+
+    @swiss_cases_by_date_filled.extender
+    def swiss_cases_by_date_filled(self, old, since):
+        return _splice_filled(old, self.swiss_cases_by_date, since)
+
+    @derived("swiss_fatalities_by_date")
+    def swiss_fatalities_by_date_filled(self):
+        return self.swiss_fatalities_by_date.fillna(method="ffill", axis=0)
+
+    @swiss_fatalities_by_date_filled.extender
+    def swiss_fatalities_by_date_filled(self, old, since):
+        return _splice_filled(old, self.swiss_fatalities_by_date, since)
+
+    @derived("swiss_hospitalizations_by_date")
+    def swiss_hospitalizations_by_date_filled(self):
+        return self.swiss_hospitalizations_by_date.fillna(method="ffill", axis=0)
+
+    @swiss_hospitalizations_by_date_filled.extender
+    def swiss_hospitalizations_by_date_filled(self, old, since):
+        return _splice_filled(old, self.swiss_hospitalizations_by_date, since)
+
+    @derived("swiss_cases_by_date_filled")
+    def swiss_cases_by_date_diff(self):
+        return self.__get_cases_diff(self.swiss_cases_by_date_filled)
+
+    @swiss_cases_by_date_diff.extender
+    def swiss_cases_by_date_diff(self, old, since):
+        # One row for the difference and three for the centred rolling mean
+        return _splice(
+            old,
+            self.swiss_cases_by_date_filled,
+            self.__get_cases_diff,
+            since,
+            lookback=4,
+            reach=3,
         )
 
-        self.swiss_cases_by_date_filled = self.swiss_cases_by_date.fillna(
-            method="ffill", axis=0
+    @derived("swiss_fatalities_by_date")
+    def swiss_fatalities_by_date_diff(self):
+        return self.__get_fatalities_diff(self.swiss_fatalities_by_date)
+
+    @swiss_fatalities_by_date_diff.extender
+    def swiss_fatalities_by_date_diff(self, old, since):
+        return _splice(
+            old,
+            self.swiss_fatalities_by_date,
+            self.__get_fatalities_diff,
+            since,
+            lookback=4,
+            reach=3,
         )
 
-        self.swiss_fatalities_by_date_filled = self.swiss_fatalities_by_date.fillna(
-            method="ffill", axis=0
+    @derived("swiss_hospitalizations_by_date")
+    def swiss_hospitalizations_by_date_diff(self):
+        return self.swiss_hospitalizations_by_date.diff().replace(0, float("nan"))
+
+    @swiss_hospitalizations_by_date_diff.extender
+    def swiss_hospitalizations_by_date_diff(self, old, since):
+        return _splice(
+            old,
+            self.swiss_hospitalizations_by_date,
+            lambda df: df.diff().replace(0, float("nan")),
+            since,
+            lookback=1,
         )
-        
-        self.swiss_hospitalizations_by_date_filled = self.swiss_hospitalizations_by_date.fillna(
-            method="ffill", axis=0
+
+    @derived("swiss_fatalities_by_date_filled", "swiss_cases_by_date_filled")
+    def swiss_case_fatality_rates(self):
+        return self.swiss_fatalities_by_date_filled / self.swiss_cases_by_date_filled
+
+    @swiss_case_fatality_rates.extender
+    def swiss_case_fatality_rates(self, old, since):
+        fatalities = self.swiss_fatalities_by_date_filled
+        cases = self.swiss_cases_by_date_filled
+        tail = fatalities[fatalities.index >= since] / cases[cases.index >= since]
+        return pd.concat([old[old.index < since], tail])
+
+    @derived("swiss_cases_by_date_filled", "swiss_demography")
+    def swiss_cases_by_date_filled_per_capita(self):
+        return self.__get_per_capita(self.swiss_cases_by_date_filled)
+
+    @swiss_cases_by_date_filled_per_capita.extender
+    def swiss_cases_by_date_filled_per_capita(self, old, since):
+        return _splice(
+            old, self.swiss_cases_by_date_filled, self.__get_per_capita, since
         )
 
-        self.swiss_case_fatality_rates = (
-            self.swiss_fatalities_by_date_filled / self.swiss_cases_by_date_filled
+    @derived("swiss_cases")
+    def latest_date(self):
+        return self.swiss_cases.iloc[len(self.swiss_cases) - 1]["Date"]
+
+    @derived("swiss_cases_by_date")
+    def updated_cantons(self):
+        l = len(self.swiss_cases_by_date)
+        return [
+            canton
+            for canton in self.swiss_cases_by_date.iloc[l - 1][
+                self.swiss_cases_by_date.iloc[l - 1].notnull()
+            ].index
+        ]
+
+    @derived("latest_date", "swiss_cases_by_date_filled")
+    def new_swiss_cases(self):
+        if (
+            date.fromisoformat(self.latest_date)
+            != datetime.now(timezone("Europe/Kiev")).date()
+        ):
+            return 0
+
+        return (
+            self.swiss_cases_by_date_filled.iloc[-1]["AT"]
+            - self.swiss_cases_by_date_filled.iloc[-2]["AT"]
         )
 
-        self.swiss_cases_by_date_filled_per_capita = (
-            self.__get_swiss_cases_by_date_filled_per_capita()
+    @derived("swiss_cases_by_date_filled")
+    def total_swiss_cases(self):
+        return self.swiss_cases_by_date_filled.iloc[- 1]["AT"]
+
+    @derived("swiss_fatalities_by_date_filled")
+    def total_swiss_fatalities(self):
+        return self.swiss_fatalities_by_date_filled.iloc[-1]["AT"]
+
+    @derived("total_swiss_fatalities", "total_swiss_cases")
+    def swiss_case_fatality_rate(self):
+        return self.total_swiss_fatalities / self.total_swiss_cases
+
+    @derived("swiss_cases")
+    def swiss_cases_as_dict(self):
+        # Put the date at the end
+        cases = self.swiss_cases.to_dict("list")
+        date_tmp = cases.pop("Date")
+        cases["Date"] = date_tmp
+        return cases
+
+    @swiss_cases_as_dict.extender
+    def swiss_cases_as_dict(self, old, since):
+        return _splice_lists(
+            old, self.swiss_cases, lambda df: df.to_dict("list"), since
         )
 
-        self.latest_date = self.__get_latest_date()
-        self.updated_cantons = self.__get_updated_cantons()
-        self.new_swiss_cases = self.__get_new_cases()
-        self.total_swiss_cases = self.__get_total_swiss_cases()
-        self.total_swiss_fatalities = self.__get_total_swiss_fatalities()
-        self.swiss_case_fatality_rate = (
-            self.total_swiss_fatalities / self.total_swiss_cases
+    @derived("swiss_cases_as_dict", "swiss_demography")
+    def swiss_cases_normalized_as_dict(self):
+        cantons = [canton for canton in self.swiss_cases_as_dict if canton != "Date"]
+        tmp = self.__get_per_capita(self.swiss_cases[cantons]).round(2).to_dict("list")
+        tmp["Date"] = self.swiss_cases_as_dict["Date"]
+        return tmp
+
+    @swiss_cases_normalized_as_dict.extender
+    def swiss_cases_normalized_as_dict(self, old, since):
+        cantons = [canton for canton in old if canton != "Date"]
+        return _splice_lists(
+            old,
+            self.swiss_cases,
+            lambda df: dict(
+                self.__get_per_capita(df[cantons]).round(2).to_dict("list"),
+                Date=list(df["Date"]),
+            ),
+            since,
         )
 
-        # Put the date at the end
-        self.swiss_cases_as_dict = self.swiss_cases.to_dict("list")
-        date_tmp = self.swiss_cases_as_dict.pop("Date")
-        self.swiss_cases_as_dict["Date"] = date_tmp
-        self.swiss_cases_normalized_as_dict = (
-            self.__get_swiss_cases_as_normalized_dict()
+    @derived("swiss_fatalities")
+    def swiss_fatalities_as_dict(self):
+        return self.swiss_fatalities.to_dict("list")
+
+    @swiss_fatalities_as_dict.extender
+    def swiss_fatalities_as_dict(self, old, since):
+        return _splice_lists(
+            old, self.swiss_fatalities, lambda df: df.to_dict("list"), since
         )
 
-        self.swiss_fatalities_as_dict = self.swiss_fatalities.to_dict("list")
-        self.canton_labels = [
+    @derived("swiss_cases")
+    def canton_labels(self):
+        return [
             canton
-            for canton in self.swiss_cases_as_dict
+            for canton in self.swiss_cases.columns
             if canton != "AT" and canton != "Date"
         ]
-        self.cantonal_centres = self.__get_cantonal_centres()
-        
-        #
-        # Moving average showing development
-        #
-
-        self.moving_total = self.__get_moving_total(
-            self.swiss_cases_by_date.diff()
-        ).replace(0, float("nan"))
-        
-        self.swiss_cases_by_date_diff["AT_rolling"] = np.round(
-            self.swiss_cases_by_date_diff["AT"]
-            .rolling(7, center=True)
-            .mean(),
-            0,
+
+    @derived("swiss_cases")
+    def date_marks(self):
+        """Labels of the first day of every month by row, for the sliders."""
+        dates = pd.to_datetime(self.swiss_cases["Date"])
+        rows = np.flatnonzero(dates.dt.day.values == 1)
+        return dict(zip(rows.tolist(), dates.iloc[rows].dt.strftime("%d. %m.")))
+
+    @derived(
+        "swiss_cases",
+        "canton_labels",
+        "swiss_cases_by_date_filled",
+        "swiss_cases_by_date_diff",
+        "swiss_cases_by_date_filled_per_capita",
+        "swiss_hospitalizations_by_date_filled",
+        "swiss_hospitalizations_by_date_diff",
+        "swiss_fatalities_by_date_filled",
+        "swiss_fatalities_by_date_diff",
+    )
+    def map_frames(self):
+        """The map values of every mode for every date, for drawing the map
+        in the browser. Per mode, ``values`` is one flat list of
+        len(dates) x len(states) values (None for missing ones), row by row,
+        and ``decimals`` the precision they are rounded and labelled to."""
+        dates = list(self.swiss_cases["Date"])
+        return {
+            "dates": dates,
+            "states": self.canton_labels,
+            "modes": {
+                mode: {
+                    "values": self.__get_map_values(df, dates, decimals),
+                    "decimals": decimals,
+                }
+                for mode, (df, decimals) in self.__get_map_modes().items()
+            },
+        }
+
+    @map_frames.extender
+    def map_frames(self, old, since):
+        dates = list(self.swiss_cases["Date"])
+        # Rows are dates, each as many values long as there are states
+        keep = int(self.swiss_cases["Date"].searchsorted(since))
+        width = len(self.canton_labels)
+        return {
+            "dates": dates,
+            "states": self.canton_labels,
+            "modes": {
+                mode: {
+                    "values": old["modes"][mode]["values"][: keep * width]
+                    + self.__get_map_values(df, dates[keep:], decimals),
+                    "decimals": decimals,
+                }
+                for mode, (df, decimals) in self.__get_map_modes().items()
+            },
+        }
+
+    #
+    # Moving average showing development
+    #
+
+    @derived("swiss_cases_by_date")
+    def moving_total(self):
+        return self.__get_moving_total(self.swiss_cases_by_date)
+
+    @moving_total.extender
+    def moving_total(self, old, since):
+        # One row for the difference and six for the rest of the week
+        return _splice(
+            old, self.swiss_cases_by_date, self.__get_moving_total, since, lookback=7
+        )
+
+    #
+    # District level data
+    #
+    # No view reads these yet, so they are deferred: they are only computed
+    # when first read, not with the rest of the snapshot
+    #
+
+    @derived("district_cases", deferred=True)
+    def district_cases_by_date(self):
+        return self.district_cases.set_index("Date")
+
+    @district_cases_by_date.extender
+    def district_cases_by_date(self, old, since):
+        return self.__splice_by_date(old, self.district_cases, since)
+
+    @derived("district_cases_by_date", deferred=True)
+    def district_cases_by_date_filled(self):
+        return self.district_cases_by_date.fillna(method="ffill")
+
+    @district_cases_by_date_filled.extender
+    def district_cases_by_date_filled(self, old, since):
+        return _splice_filled(old, self.district_cases_by_date, since)
+
+    @derived("district_cases_by_date_filled", deferred=True)
+    def district_cases_by_date_diff(self):
+        return self.district_cases_by_date_filled.diff()
+
+    @district_cases_by_date_diff.extender
+    def district_cases_by_date_diff(self, old, since):
+        return _splice(
+            old,
+            self.district_cases_by_date_filled,
+            lambda df: df.diff(),
+            since,
+            lookback=1,
         )
-        
-        self.swiss_fatalities_by_date_diff["AT_rolling"] = np.round(
-            self.swiss_fatalities_by_date_diff["AT"]
-            .rolling(7, center=True)
-            .mean(),
-            0,
+
+    @derived("district_cases_by_date", deferred=True)
+    def district_moving_total(self):
+        return self.__get_moving_total(self.district_cases_by_date)
+
+    @district_moving_total.extender
+    def district_moving_total(self, old, since):
+        return _splice(
+            old,
+            self.district_cases_by_date,
+            self.__get_moving_total,
+            since,
+            lookback=7,
         )
-        
-        #
-        # World related data
-        #
 
-        self.world_case_fatality_rate = (
-            self.world_fataltities.iloc[-1] / self.world_cases.iloc[-1]
+    @derived("district_cases_by_date_filled", deferred=True)
+    def district_rollup(self):
+        """The filled district cases summed per state and for AT."""
+        return districts.rollup(self.district_cases_by_date_filled)
+
+    @district_rollup.extender
+    def district_rollup(self, old, since):
+        return _splice(old, self.district_cases_by_date_filled, districts.rollup, since)
+
+    #
+    # World related data
+    #
+
+    @derived("world_fataltities", "world_cases", deferred=True)
+    def world_case_fatality_rate(self):
+        return self.world_fataltities.iloc[-1] / self.world_cases.iloc[-1]
+
+    @derived("world_cases", "swiss_cases", deferred=True)
+    def swiss_world_cases_normalized(self, min_prevalence: int = 0.4):
+        tmp = self.world_cases.copy()
+        # Don't take today, as values are usually very incomplete
+        tmp["Austria"] = pd.Series(self.swiss_cases["AT"].values[:-1])
+
+        tmp = tmp / pd.Series(self.world_population)[tmp.columns] * 10000
+        tmp[tmp < min_prevalence] = 0
+
+        # Shift every country to start on its first day above the threshold
+        values = tmp.values
+        rows = len(values)
+        started = values != 0
+        first = np.where(started.any(axis=0), started.argmax(axis=0), rows)
+        shifted = np.arange(rows)[:, None] + first
+        values = np.where(
+            shifted < rows,
+            values[np.minimum(shifted, rows - 1), np.arange(values.shape[1])],
+            np.nan,
         )
+        tmp = pd.DataFrame(values, index=tmp.index, columns=tmp.columns)
+        tmp.dropna(how="all", inplace=True)
+
+        return tmp
+
+    #
+    # Some regression analysis on the data
+    #
 
-        self.swiss_world_cases_normalized = self.__get_swiss_world_cases_normalized()
-        
-        #
-        # Some regression analysis on the data
-        #
-        self.prevalence_density_regression = self.__get_regression(
+    @derived(
+        "swiss_demography", "swiss_cases_by_date_filled_per_capita", deferred=True
+    )
+    def prevalence_density_regression(self):
+        return self.__get_regression(
             self.swiss_demography["Density"],
             self.swiss_cases_by_date_filled_per_capita.iloc[-1],
         )
 
-        self.cfr_age_regression = self.__get_regression(
+    @derived("swiss_demography", "swiss_case_fatality_rates", deferred=True)
+    def cfr_age_regression(self):
+        return self.__get_regression(
             self.swiss_demography["O65"], self.swiss_case_fatality_rates.iloc[-1]
         )
 
-        self.scaled_cases = self.__get_scaled_cases()
+    @derived("swiss_cases_by_date_filled")
+    def scaled_cases(self):
+        cases = self.swiss_cases_by_date_filled.iloc[-1][0:-1]
+        min_cases = cases.min()
+        max_cases = cases.max()
+        scaled_cases = (cases - min_cases) / (max_cases - min_cases) * (20) + 10
+        return scaled_cases
 
-    def __get_latest_date(self):
-        return self.swiss_cases.iloc[len(self.swiss_cases) - 1]["Date"]
+    def __splice_by_date(self, old, source, since):
+        return pd.concat(
+            [old[old.index < since], source[source["Date"] >= since].set_index("Date")]
+        )
 
-    def __get_updated_cantons(self):
-        l = len(self.swiss_cases_by_date)
-        return [
-            canton
-            for canton in self.swiss_cases_by_date.iloc[l - 1][
-                self.swiss_cases_by_date.iloc[l - 1].notnull()
-            ].index
+    def __get_cases_diff(self, filled):
+        diff = filled.diff().replace(0, float("nan"))
+        diff["date_label"] = [
+            date.fromisoformat(d).strftime("%d. %m.") for d in diff.index.values
         ]
+        diff["AT_rolling"] = np.round(diff["AT"].rolling(7, center=True).mean(), 0)
+        return diff
 
-    def __get_swiss_cases_by_date_filled_per_capita(self):
-        tmp = self.swiss_cases_by_date_filled.copy()
+    def __get_fatalities_diff(self, by_date):
+        diff = by_date.diff().replace(0, float("nan"))
+        diff["AT_rolling"] = np.round(diff["AT"].rolling(7, center=True).mean(), 0)
+        return diff
 
-        for column in tmp:
-            tmp[column] = (
-                tmp[column] / self.swiss_demography["Population"][column] * 10000
-            )
-        return tmp
+    def __get_per_capita(self, df):
+        return df / self.swiss_demography["Population"][df.columns] * 10000
 
-    def __get_new_cases(self):
-        if (
-            date.fromisoformat(self.latest_date)
-            != datetime.now(timezone("Europe/Kiev")).date()
-        ):
-            return 0
+    def __get_moving_total(self, by_date):
+        return windows.moving_total(by_date.diff()).replace(0, float("nan"))
 
-        return (
-            self.swiss_cases_by_date_filled.iloc[-1]["AT"]
-            - self.swiss_cases_by_date_filled.iloc[-2]["AT"]
-        )
-
-    def __get_total_swiss_cases(self):
-        return self.swiss_cases_by_date_filled.iloc[- 1]["AT"]
-
-    def __get_total_swiss_fatalities(self):
-        return self.swiss_fatalities_by_date_filled.iloc[-1]["AT"]
+    def __get_map_modes(self):
+        return {
+            "number": (self.swiss_cases_by_date_filled, 0),
+            "new": (self.swiss_cases_by_date_diff, 0),
+            "prevalence": (self.swiss_cases_by_date_filled_per_capita, 1),
+            "new_hospitalizations": (self.swiss_hospitalizations_by_date_diff, 0),
+            "hospitalizations": (self.swiss_hospitalizations_by_date_filled, 0),
+            "new_fatalities": (self.swiss_fatalities_by_date_diff, 0),
+            "fatalities": (self.swiss_fatalities_by_date_filled, 0),
+        }
 
-    def __get_swiss_cases_as_normalized_dict(self):
-        tmp = [
-            (
-                str(canton),
-                [
-                    round(i, 2)
-                    for i in self.swiss_cases_as_dict[canton]
-                    / self.swiss_demography["Population"][canton]
-                    * 10000
-                ],
-            )
-            for canton in self.swiss_cases_as_dict
-            if canton != "Date"
+    def __get_map_values(self, df, dates, decimals):
+        values = df.reindex(dates)[self.canton_labels].values.astype(float)
+        if decimals == 0:
+            return [None if math.isnan(v) else int(v) for v in values.ravel().tolist()]
+        return [
+            None if math.isnan(v) else round(v, decimals)
+            for v in values.ravel().tolist()
         ]
-        tmp.append(("Date", self.swiss_cases_as_dict["Date"]))
-        return dict(tmp)
 
     def __simplify_world_data(self, df: pd.DataFrame):
         df.drop(columns=["Lat", "Long"], inplace=True)
@@ -215,26 +693,10 @@ class DataLoader:
         df.index = range(0, len(df))
         return df
 
-    def __get_swiss_world_cases_normalized(self, min_prevalence: int = 0.4):
-        tmp = self.world_cases.copy()
-        # Don't take today, as values are usually very incomplete
-        tmp["Austria"] = pd.Series(self.swiss_cases_as_dict["AT"][:-1])
-
-        for column in tmp:
-            tmp[column] = tmp[column] / self.world_population[column] * 10000
-
-        tmp[tmp < min_prevalence] = 0
-        for column in tmp:
-            while tmp[column].iloc[0] == 0:
-                tmp[column] = tmp[column].shift(-1)
-        tmp.dropna(how="all", inplace=True)
-
-        return tmp
-
     def __get_regression(self, x, y):
         df = pd.DataFrame([x, y])
         df = df.dropna(axis=1, how="any")
-        slope, intercept, r_value, p_value, std_err = stats.linregress(
+        slope, intercept, r_value, p_value, std_err = regression.linregress(
             df.iloc[0], df.iloc[1]
         )
         m = df.iloc[0].min() + (df.iloc[0].max() - df.iloc[0].min()) / 2
@@ -252,36 +714,6 @@ class DataLoader:
             ],
         }
 
-    def __get_scaled_cases(self):
-        cases = self.swiss_cases_by_date_filled.iloc[-1][0:-1]
-        min_cases = cases.min()
-        max_cases = cases.max()
-        scaled_cases = (cases - min_cases) / (max_cases - min_cases) * (20) + 10
-        return scaled_cases
-
-    def __get_moving_total(self, df, days=7):
-        offset = days - 1
-        df_moving_total = df[0:0]
-        for i in range(0, len(df)):
-            start = max(0, i - offset)
-            d = pd.Series(df.iloc[start : i + 1].sum().to_dict())
-            d.name = df.index[i]
-            df_moving_total = df_moving_total.append(d)
-
-        # Add the label for the date range (previous week)
-        date_labels = []
-        for d in df_moving_total.index.values:
-            today = date.fromisoformat(d)
-            date_labels.append(
-                (today - timedelta(days=7)).strftime("%d. %m.")
-                + " – "
-                + today.strftime("%d. %m.")
-            )
-
-        df_moving_total["date_label"] = date_labels
-
-        return df_moving_total
-
     def __get_world_population(self):
         return {
             "France": 65273511,
@@ -0,0 +1,67 @@
+class derived:
+    """Declares a memoized, lazily computed attribute.
+
+    The decorated method is run on first attribute access and its result is
+    stored in the instance ``__dict__``, so later lookups never reach the
+    descriptor again. ``sources`` lists the attributes the value is built
+    from, which lets the owner drop stale values when a source changes.
+
+    A derived value that can be updated from newly appended rows registers an
+    extender with ``@<name>.extender``. It is called with the stale value and
+    the first date that changed, and returns the updated value.
+
+    A ``deferred`` value is only needed by parts of the page that are loaded
+    on demand, so owners computing their values up front leave it out.
+    """
+
+    def __init__(self, *sources, deferred=False):
+        self.sources = sources
+        self.deferred = deferred
+        self.func = None
+        self.name = None
+        self.extend = None
+
+    def __call__(self, func):
+        self.func = func
+        self.name = func.__name__
+        self.__doc__ = func.__doc__
+        return self
+
+    def extender(self, func):
+        self.extend = func
+        return self
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        value = self.func(instance)
+        instance.__dict__[self.name] = value
+        return value
+
+
+def derived_attributes(cls):
+    """Returns the derived attributes of a class in definition order."""
+    attributes = {}
+    for klass in reversed(cls.__mro__):
+        for name, value in vars(klass).items():
+            if isinstance(value, derived):
+                attributes[name] = value
+    return attributes
+
+
+def dependents(cls, names):
+    """Returns the names of all derived attributes that (transitively) depend
+    on any of ``names``, including those names themselves."""
+    attributes = derived_attributes(cls)
+    stale = set(names)
+    changed = True
+    while changed:
+        changed = False
+        for name, attribute in attributes.items():
+            if name not in stale and stale.intersection(attribute.sources):
+                stale.add(name)
+                changed = True
+    return stale
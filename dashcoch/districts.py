@@ -0,0 +1,141 @@
+"""The Austrian districts (Bezirke) and the rollup of district series to the
+states and the total for Austria."""
+import numpy as np
+import pandas as pd
+
+STATES = ["B", "K", "NÖ", "OÖ", "S", "ST", "T", "V", "W"]
+
+DISTRICTS = {
+    "Amstetten": "NÖ",
+    "Baden": "NÖ",
+    "Bludenz": "V",
+    "Braunau am Inn": "OÖ",
+    "Bregenz": "V",
+    "Bruck an der Leitha": "NÖ",
+    "Bruck-Mürzzuschlag": "ST",
+    "Deutschlandsberg": "ST",
+    "Dornbirn": "V",
+    "Eferding": "OÖ",
+    "Eisenstadt(Stadt)": "B",
+    "Eisenstadt-Umgebung": "B",
+    "Feldkirch": "V",
+    "Feldkirchen": "K",
+    "Freistadt": "OÖ",
+    "Gänserndorf": "NÖ",
+    "Gmünd": "NÖ",
+    "Gmunden": "OÖ",
+    "Graz(Stadt)": "ST",
+    "Graz-Umgebung": "ST",
+    "Grieskirchen": "OÖ",
+    "Gröbming": "ST",
+    "Güssing": "B",
+    "Hallein": "S",
+    "Hartberg-Fürstenfeld": "ST",
+    "Hermagor": "K",
+    "Hollabrunn": "NÖ",
+    "Horn": "NÖ",
+    "Imst": "T",
+    "Innsbruck-Land": "T",
+    "Innsbruck-Stadt": "T",
+    "Jennersdorf": "B",
+    "Kirchdorf an der Krems": "OÖ",
+    "Kitzbühel": "T",
+    "Klagenfurt Land": "K",
+    "Klagenfurt Stadt": "K",
+    "Korneuburg": "NÖ",
+    "Krems an der Donau(Stadt)": "NÖ",
+    "Krems(Land)": "NÖ",
+    "Kufstein": "T",
+    "Landeck": "T",
+    "Leibnitz": "ST",
+    "Leoben": "ST",
+    "Lienz": "T",
+    "Liezen": "ST",
+    "Lilienfeld": "NÖ",
+    "Linz(Stadt)": "OÖ",
+    "Linz-Land": "OÖ",
+    "Mattersburg": "B",
+    "Melk": "NÖ",
+    "Mistelbach": "NÖ",
+    "Mödling": "NÖ",
+    "Murau": "ST",
+    "Murtal": "ST",
+    "Neunkirchen": "NÖ",
+    "Neusiedl am See": "B",
+    "Oberpullendorf": "B",
+    "Oberwart": "B",
+    "Perg": "OÖ",
+    "Reutte": "T",
+    "Ried im Innkreis": "OÖ",
+    "Rohrbach": "OÖ",
+    "Salzburg(Stadt)": "S",
+    "Salzburg-Umgebung": "S",
+    "Sankt Johann im Pongau": "S",
+    "Sankt Pölten(Land)": "NÖ",
+    "Sankt Pölten(Stadt)": "NÖ",
+    "Sankt Veit an der Glan": "K",
+    "Schärding": "OÖ",
+    "Scheibbs": "NÖ",
+    "Schwaz": "T",
+    "Spittal an der Drau": "K",
+    "Steyr(Stadt)": "OÖ",
+    "Steyr-Land": "OÖ",
+    "Südoststeiermark": "ST",
+    "Tamsweg": "S",
+    "Tulln": "NÖ",
+    "Urfahr-Umgebung": "OÖ",
+    "Villach Land": "K",
+    "Villach Stadt": "K",
+    "Vöcklabruck": "OÖ",
+    "Voitsberg": "ST",
+    "Völkermarkt": "K",
+    "Waidhofen an der Thaya": "NÖ",
+    "Waidhofen an der Ybbs(Stadt)": "NÖ",
+    "Weiz": "ST",
+    "Wels(Stadt)": "OÖ",
+    "Wels-Land": "OÖ",
+    "Wien(Stadt)": "W",
+    "Wiener Neustadt(Land)": "NÖ",
+    "Wiener Neustadt(Stadt)": "NÖ",
+    "Wolfsberg": "K",
+    "Zell am See": "S",
+    "Zwettl": "NÖ",
+}
+
+
+def empty_frame():
+    """A frame in the schema of the district CSV without any rows."""
+    return pd.DataFrame(
+        {
+            "Date": pd.Series([], dtype=object),
+            **{district: pd.Series([], dtype=float) for district in DISTRICTS},
+        }
+    )
+
+
+def indicator(districts, mapping: dict = DISTRICTS):
+    """0/1 matrix with a row per district and a column per state of
+    ``STATES``, plus a last one for AT, marking where each district is
+    counted."""
+    columns = {state: i for i, state in enumerate(STATES)}
+    matrix = np.zeros((len(districts), len(STATES) + 1))
+    matrix[np.arange(len(districts)), [columns[mapping[d]] for d in districts]] = 1
+    matrix[:, -1] = 1
+    return matrix
+
+
+def rollup(df: pd.DataFrame, mapping: dict = DISTRICTS):
+    """Sums the district columns of ``df`` into a column per state and one for
+    AT. Missing values count as zero, but a state without any reported
+    district on a date is missing, as is AT on a date without any.
+
+    The values and the pattern of the reported ones are aggregated together,
+    in a single product with the indicator matrix, so the cost does not
+    depend on the number of states."""
+    values = df.values.astype(float)
+    reported = ~np.isnan(values)
+    matrix = indicator(list(df.columns), mapping)
+    stacked = np.concatenate([np.where(reported, values, 0), reported]) @ matrix
+    totals, counts = stacked[: len(df)], stacked[len(df) :]
+    totals[counts == 0] = np.nan
+    return pd.DataFrame(totals, index=df.index, columns=STATES + ["AT"])
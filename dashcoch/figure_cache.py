@@ -0,0 +1,98 @@
+import json
+import threading
+from collections import OrderedDict
+from functools import wraps
+import flask
+import plotly
+
+
+class FigureCache:
+    """Bounded LRU cache of serialized Dash callback responses.
+
+    Dash callbacks here are pure functions of their inputs and the current
+    dataset, so the JSON response of a callback can be reused for the same
+    (callback, inputs, data version). Entries are evicted least recently used
+    first once their total size exceeds ``max_bytes``.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def get(self, key):
+        with self.__lock:
+            value = self.__entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.__entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        with self.__lock:
+            if key in self.__entries:
+                self.size -= len(self.__entries.pop(key))
+            self.__entries[key] = value
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                _, evicted = self.__entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self.__lock:
+            self.__entries.clear()
+            self.size = 0
+
+    def memoize_callbacks(self, app, get_version, exclude=()):
+        """Caches the responses of every server-side callback registered on
+        ``app`` so far. Call it after all callbacks have been defined.
+        ``get_version`` returns the version of the current dataset."""
+        for callback_id, callback in app.callback_map.items():
+            if "callback" in callback and callback_id not in exclude:
+                callback["callback"] = self.__memoize(
+                    callback_id, callback["callback"], get_version
+                )
+
+    def memoize_layout(self, app, get_version, dumps=None):
+        """Serves the layout of ``app`` from the cache, so a callable layout
+        is only built and serialized once per dataset. ``dumps`` serializes
+        it, by default as Dash does."""
+        if dumps is None:
+            dumps = lambda layout: json.dumps(
+                layout, cls=plotly.utils.PlotlyJSONEncoder
+            )
+
+        def serve_layout():
+            key = ("_dash-layout", get_version())
+            body = self.get(key)
+            if body is None:
+                body = dumps(app._layout_value())
+                self.put(key, body)
+            return flask.Response(body, mimetype="application/json")
+
+        endpoint = app.config.routes_pathname_prefix + "_dash-layout"
+        app.server.view_functions[endpoint] = serve_layout
+
+    def __memoize(self, callback_id, func, get_version):
+        @wraps(func)
+        def memoized(*args, **kwargs):
+            key = (
+                callback_id,
+                get_version(),
+                json.dumps([args, kwargs], sort_keys=True),
+            )
+            response = self.get(key)
+            if response is None:
+                # func returns the serialized response
+                response = func(*args, **kwargs)
+                self.put(key, response)
+            return response
+
+        return memoized
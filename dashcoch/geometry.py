@@ -0,0 +1,321 @@
+"""Simplified, pre-compressed versions of the map geometry.
+
+The choropleth does not need the full resolution of the source GeoJSON. For
+each map height in ``HEIGHTS``, the coordinates are snapped to a grid and
+simplified with Douglas-Peucker to half a pixel at that height. Borders are
+split into arcs at the vertices where neighbouring states meet, and every arc
+is simplified once for all the rings it belongs to, so adjacent states keep
+sharing their borders exactly (no gaps or overlaps).
+
+Each level is written under a content-hashed name, next to its gzip and, if
+the brotli module is installed, brotli variants and a manifest.
+
+    python -m dashcoch.geometry [--settings settings.ini]
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import math
+import os
+import tempfile
+from configparser import ConfigParser
+import numpy as np
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+HEIGHTS = (300, 600, 1200)
+TOLERANCE = 0.5  # in pixels
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def build(source: str, directory: str, heights=HEIGHTS):
+    """Writes one simplified level per map height and the manifest
+    describing them. Returns the manifest."""
+    with open(source, "rb") as f:
+        content = f.read()
+    collection = json.loads(content)
+
+    # Borders are simplified in pixels of the map, which is at most as tall as
+    # the geometry; longitudes are scaled to the same length as latitudes
+    west, south, east, north = _bounds(collection)
+    aspect = math.cos(math.radians((south + north) / 2))
+
+    levels = []
+    for height in sorted(heights):
+        tolerance = TOLERANCE * (north - south) / height
+        digits = math.ceil(-math.log10(tolerance / 4))
+        simplified = simplify(collection, tolerance, digits, aspect)
+        body = json.dumps(simplified, separators=(",", ":")).encode()
+        name = "{}.{}.{}.geojson".format(
+            os.path.splitext(os.path.basename(source))[0],
+            height,
+            hashlib.sha1(body).hexdigest()[:12],
+        )
+        _write(directory, name, body)
+        levels.append({"height": height, "file": name, "bytes": len(body)})
+
+    manifest = {"source": hashlib.sha1(content).hexdigest(), "levels": levels}
+    _write(directory, "manifest.json", json.dumps(manifest).encode(), False)
+    return manifest
+
+
+def load(source: str, directory: str):
+    """Returns the manifest of the levels built from ``source``, building them
+    first if they are missing or were built from an older source."""
+    try:
+        with open(os.path.join(directory, "manifest.json")) as f:
+            manifest = json.load(f)
+        with open(source, "rb") as f:
+            digest = hashlib.sha1(f.read()).hexdigest()
+    except (OSError, ValueError):
+        return build(source, directory)
+    if manifest["source"] != digest or not all(
+        os.path.exists(os.path.join(directory, level["file"]))
+        for level in manifest["levels"]
+    ):
+        return build(source, directory)
+    return manifest
+
+
+def pick(manifest, height: int):
+    """File name of the lightest level that is detailed enough for a map of
+    the given height."""
+    for level in manifest["levels"]:
+        if level["height"] >= height:
+            return level["file"]
+    return manifest["levels"][-1]["file"]
+
+
+def negotiate(directory: str, name: str, accept_encoding: str):
+    """Returns the file name of the best pre-compressed variant of ``name``
+    the client accepts and its content encoding (None if uncompressed)."""
+    accepted = {
+        token.split(";")[0].strip().lower()
+        for token in accept_encoding.split(",")
+        if not token.replace(" ", "").endswith(";q=0")
+    }
+    for encoding, suffix in ENCODINGS:
+        if encoding in accepted and os.path.exists(
+            os.path.join(directory, name + suffix)
+        ):
+            return name + suffix, encoding
+    return name, None
+
+
+def simplify(collection, tolerance: float, digits: int, aspect: float = 1.0):
+    """Simplifies every ring of a GeoJSON feature collection of polygons,
+    preserving shared borders. Coordinates are rounded to ``digits``
+    decimals first. Rings that collapse are dropped, except the outer ring
+    of the first polygon of a feature, which is kept unsimplified."""
+    features = []
+    rings = []
+    for feature in collection["features"]:
+        geometry = feature["geometry"]
+        polygons = (
+            [geometry["coordinates"]]
+            if geometry["type"] == "Polygon"
+            else geometry["coordinates"]
+        )
+        features.append((feature, geometry["type"], len(rings), len(polygons)))
+        for i, polygon in enumerate(polygons):
+            for j, ring in enumerate(polygon):
+                rings.append((_quantize(ring, digits), (i, j)))
+
+    # Each vertex and each edge, in either direction, and the rings they
+    # belong to
+    vertices = {}
+    edges = {}
+    for index, (ring, _) in enumerate(rings):
+        for a, b in zip(ring, ring[1:]):
+            vertices.setdefault(a, set()).add(index)
+            edges.setdefault(frozenset((a, b)), set()).add(index)
+
+    arcs = {}
+    simplified = []
+    for ring, position in rings:
+        result = _simplify_ring(ring, vertices, edges, arcs, tolerance, aspect)
+        if len(result) < 4:
+            result = ring if position == (0, 0) else None
+        simplified.append((result, position))
+
+    output = []
+    for feature, geometry_type, start, count in features:
+        polygons = [[] for _ in range(count)]
+        for ring, (i, j) in simplified[start : start + _ring_count(feature)]:
+            if ring is not None and (j == 0 or polygons[i]):
+                polygons[i].append([list(point) for point in ring])
+        polygons = [polygon for polygon in polygons if polygon]
+        output.append(
+            {
+                **feature,
+                "geometry": {
+                    "type": geometry_type,
+                    "coordinates": polygons[0]
+                    if geometry_type == "Polygon"
+                    else polygons,
+                },
+            }
+        )
+    return {**collection, "features": output}
+
+
+def _ring_count(feature):
+    geometry = feature["geometry"]
+    if geometry["type"] == "Polygon":
+        return len(geometry["coordinates"])
+    return sum(len(polygon) for polygon in geometry["coordinates"])
+
+
+def _quantize(ring, digits):
+    result = []
+    for x, y in ring:
+        point = (round(x, digits), round(y, digits))
+        if not result or result[-1] != point:
+            result.append(point)
+    if result[0] != result[-1]:
+        result.append(result[0])
+    return result
+
+
+def _simplify_ring(ring, vertices, edges, arcs, tolerance, aspect):
+    points = ring[:-1]
+    n = len(points)
+    if n < 3:
+        return ring
+
+    # Junctions are the vertices where the set of rings sharing the border
+    # changes, or where other rings touch this one. They are kept, so shared
+    # arcs end at the same vertices in all rings.
+    owners = [
+        edges[frozenset((points[i], points[(i + 1) % n]))] for i in range(n)
+    ]
+    junctions = [
+        i
+        for i in range(n)
+        if owners[i] != owners[i - 1] or vertices[points[i]] != owners[i]
+    ]
+    if not junctions:
+        # A ring sharing its whole border, or none of it: anchor it at
+        # vertices that do not depend on where or in which direction the
+        # ring starts
+        first = points.index(min(points))
+        second = max(range(n), key=lambda i: _distance(points[i], points[first]))
+        junctions = sorted({first, second})
+
+    result = []
+    for k, start in enumerate(junctions):
+        end = junctions[(k + 1) % len(junctions)]
+        if end <= start:
+            end += n
+        arc = [points[i % n] for i in range(start, end + 1)]
+        result.extend(_simplify_arc(arc, arcs, tolerance, aspect)[:-1])
+    result.append(result[0])
+    return result
+
+
+def _simplify_arc(arc, arcs, tolerance, aspect):
+    # Simplified in a canonical direction, so both rings sharing an arc get
+    # the same vertices
+    reverse = arc[-1] < arc[0] or (arc[-1] == arc[0] and arc[-2] < arc[1])
+    key = tuple(reversed(arc)) if reverse else tuple(arc)
+    if key not in arcs:
+        coordinates = np.array(key) * (aspect, 1.0)
+        keep = _douglas_peucker(coordinates, tolerance)
+        arcs[key] = [key[i] for i in keep]
+    return arcs[key][::-1] if reverse else arcs[key]
+
+
+def _douglas_peucker(coordinates, tolerance):
+    keep = {0, len(coordinates) - 1}
+    stack = [(0, len(coordinates) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        a, b = coordinates[first], coordinates[last]
+        segment = b - a
+        points = coordinates[first + 1 : last] - a
+        length = np.hypot(*segment)
+        if length == 0:
+            distances = np.hypot(points[:, 0], points[:, 1])
+        else:
+            distances = (
+                np.abs(segment[0] * points[:, 1] - segment[1] * points[:, 0])
+                / length
+            )
+        i = int(np.argmax(distances))
+        if distances[i] > tolerance:
+            keep.add(first + 1 + i)
+            stack.append((first, first + 1 + i))
+            stack.append((first + 1 + i, last))
+    return sorted(keep)
+
+
+def _distance(a, b):
+    return math.hypot(a[0] - b[0], a[1] - b[1])
+
+
+def _bounds(collection):
+    points = np.array(
+        [
+            point
+            for feature in collection["features"]
+            for polygon in (
+                [feature["geometry"]["coordinates"]]
+                if feature["geometry"]["type"] == "Polygon"
+                else feature["geometry"]["coordinates"]
+            )
+            for ring in polygon
+            for point in ring
+        ]
+    )
+    return (*points.min(axis=0), *points.max(axis=0))
+
+
+def _write(directory, name, body, compress=True):
+    os.makedirs(directory, exist_ok=True)
+    variants = [(name, body)]
+    if compress:
+        variants.append((name + ".gz", gzip.compress(body, 9, mtime=0)))
+        if brotli is not None:
+            variants.append((name + ".br", brotli.compress(body)))
+    # The file itself is written last, as its presence marks the variants
+    # as complete. Each writer has its own temporary files, as every worker
+    # builds missing levels on startup
+    for file_name, content in reversed(variants):
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=file_name, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(content)
+            # Public like any other asset, mkstemp creates it private
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, os.path.join(directory, file_name))
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+
+def main():
+    argparser = argparse.ArgumentParser(
+        description="Builds the simplified map geometry."
+    )
+    argparser.add_argument("--settings", default="settings.ini")
+    args = argparser.parse_args()
+
+    parser = ConfigParser()
+    parser.read(args.settings)
+    manifest = build(
+        parser.get("geometry", "source", fallback="assets/austria.geojson"),
+        parser.get("geometry", "directory", fallback=".cache/geometry"),
+    )
+    for level in manifest["levels"]:
+        print("{height:>5} px  {bytes:>8} bytes  {file}".format(**level))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+import threading
+import time
+from bisect import bisect_left
+import flask
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1e3, 1e4, 3e4, 1e5, 3e5, 1e6, 3e6, 1e7)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            cumulative += count
+            yield name + "_bucket", dict(labels, le=_format(bound)), cumulative
+        yield name + "_sum", labels, self.sum
+        yield name + "_count", labels, self.count
+
+
+class Metrics:
+    """Latency, response size and request counts of the Dash callbacks, plus
+    gauges and counters computed when scraped, in the Prometheus text format.
+
+    Callbacks are told apart by their output ID, as sent by the browser, and
+    measured around the whole request, including the serialization of the
+    response. Recording takes a few microseconds, so it can be left on.
+
+    Every process keeps its own metrics, so with several gunicorn workers,
+    each scrape shows the requests served by one of them.
+    """
+
+    def __init__(self, prefix: str = "dashcoch"):
+        self.prefix = prefix
+        self.callbacks = {}
+        self.values = []
+        self.__lock = threading.Lock()
+
+    def observe_callback(self, callback_id, seconds, size, status):
+        with self.__lock:
+            callback = self.callbacks.get(callback_id)
+            if callback is None:
+                callback = self.callbacks[callback_id] = {
+                    "latency": Histogram(LATENCY_BUCKETS),
+                    "size": Histogram(SIZE_BUCKETS),
+                    "requests": {},
+                }
+            callback["latency"].observe(seconds)
+            callback["size"].observe(size)
+            callback["requests"][status] = callback["requests"].get(status, 0) + 1
+
+    def gauge(self, name, documentation, func):
+        """Registers a gauge whose value is ``func()`` at the time of the
+        scrape. A value of None is left out."""
+        self.values.append((self.prefix + "_" + name, "gauge", documentation, func))
+
+    def counter(self, name, documentation, func):
+        """Registers a counter whose value is ``func()`` at the time of the
+        scrape, which has to only ever increase. ``name`` should end in
+        "_total". A value of None is left out."""
+        self.values.append((self.prefix + "_" + name, "counter", documentation, func))
+
+    def instrument(self, server, callbacks=None, path="/_dash-update-component"):
+        """Measures the callback requests handled by the Flask ``server``.
+        Output IDs not in ``callbacks`` (e.g. a Dash app's ``callback_map``)
+        are recorded as "unknown", so clients cannot add label values."""
+
+        @server.before_request
+        def start_timer():
+            if flask.request.path == path:
+                flask.g.metrics_start = time.perf_counter()
+
+        @server.after_request
+        def record(response):
+            start = flask.g.pop("metrics_start", None)
+            if start is not None:
+                body = flask.request.get_json(silent=True) or {}
+                callback_id = body.get("output")
+                if callbacks is not None and callback_id not in callbacks:
+                    callback_id = "unknown"
+                self.observe_callback(
+                    callback_id,
+                    time.perf_counter() - start,
+                    response.calculate_content_length() or 0,
+                    response.status_code,
+                )
+            return response
+
+    def serve(self, server, route="/metrics"):
+        """Exposes the metrics on ``route`` of the Flask ``server``."""
+
+        @server.route(route)
+        def metrics():
+            return flask.Response(
+                self.render(), mimetype="text/plain; version=0.0.4"
+            )
+
+    def render(self):
+        lines = []
+        with self.__lock:
+            callbacks = sorted(self.callbacks.items())
+            families = [
+                (
+                    "callback_duration_seconds",
+                    "histogram",
+                    "Time spent handling callback requests.",
+                    [
+                        sample
+                        for callback_id, callback in callbacks
+                        for sample in callback["latency"].samples(
+                            self.prefix + "_callback_duration_seconds",
+                            {"callback": callback_id},
+                        )
+                    ],
+                ),
+                (
+                    "callback_response_bytes",
+                    "histogram",
+                    "Size of the callback responses before compression.",
+                    [
+                        sample
+                        for callback_id, callback in callbacks
+                        for sample in callback["size"].samples(
+                            self.prefix + "_callback_response_bytes",
+                            {"callback": callback_id},
+                        )
+                    ],
+                ),
+                (
+                    "callback_requests_total",
+                    "counter",
+                    "Callback requests by response status.",
+                    [
+                        (
+                            self.prefix + "_callback_requests_total",
+                            {"callback": callback_id, "status": str(status)},
+                            count,
+                        )
+                        for callback_id, callback in callbacks
+                        for status, count in sorted(callback["requests"].items())
+                    ],
+                ),
+            ]
+
+        for name, kind, documentation, samples in families:
+            lines.append("# HELP {}_{} {}".format(self.prefix, name, documentation))
+            lines.append("# TYPE {}_{} {}".format(self.prefix, name, kind))
+            lines.extend(_sample(*sample) for sample in samples)
+
+        for name, kind, documentation, func in self.values:
+            value = func()
+            if value is None:
+                continue
+            lines.append("# HELP {} {}".format(name, documentation))
+            lines.append("# TYPE {} {}".format(name, kind))
+            lines.append(_sample(name, {}, value))
+        return "\n".join(lines) + "\n"
+
+
+def _sample(name, labels, value):
+    if labels:
+        name += "{" + ",".join(
+            '{}="{}"'.format(key, _escape(str(label))) for key, label in labels.items()
+        ) + "}"
+    return "{} {}".format(name, _format(value))
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format(value):
+    if value != value:
+        return "NaN"
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
@@ -0,0 +1,112 @@
+import threading
+import time
+from configparser import ConfigParser
+from . import shared
+from .data_loader import DataLoader, data_version
+
+
+class DataRefresher:
+    """Keeps a current DataLoader snapshot and replaces it when the source
+    files change.
+
+    A daemon thread polls ``data_version`` every ``interval`` seconds, which
+    only stats the source files. When the version changed, a new loader is
+    built on that thread, off the request path, and published with a single
+    reference assignment. If rows were only appended to the files, the new
+    loader is a copy of the current one extended with them. Readers should
+    fetch ``current`` once per request and use that snapshot throughout, so
+    they never see a mix of two versions or a half-built object.
+
+    With gunicorn, start the refresher in each worker (i.e. without
+    ``--preload``), as threads do not survive the fork.
+
+    If ``shared_directory`` is given, snapshots are not built but attached from
+    the shared snapshots published there (see ``dashcoch.shared``). Until one
+    has been published, the worker builds its own.
+
+    A snapshot whose source files changed while it was built is discarded
+    and built again on the next check.
+
+    ``lazy`` only applies to the first snapshot, for a fast start. Later
+    snapshots compute every attribute that is not deferred before they are
+    published, so no request after a swap pays for the build.
+
+    ``build_seconds`` is how long loading the current snapshot took and
+    ``loaded_at`` the time it was published.
+    """
+
+    def __init__(
+        self,
+        parser: ConfigParser,
+        interval: float = 60,
+        lazy=False,
+        shared_directory=None,
+    ):
+        self.parser = parser
+        self.interval = interval
+        self.shared_directory = shared_directory
+        self.current = None
+        start = time.perf_counter()
+        if shared_directory:
+            self.current = shared.attach(parser, shared_directory)
+        if self.current is None:
+            self.current = DataLoader(parser, lazy=lazy)
+        self.build_seconds = time.perf_counter() - start
+        self.loaded_at = time.time()
+        self.listeners = []
+        self.__thread = None
+
+    def on_swap(self, listener):
+        """Registers ``listener(old, new)`` to be called after a new snapshot
+        has been published."""
+        self.listeners.append(listener)
+        return listener
+
+    def start(self):
+        if self.__thread is None and self.interval > 0:
+            self.__thread = threading.Thread(
+                target=self.__run, name="data-refresher", daemon=True
+            )
+            self.__thread.start()
+
+    def check(self):
+        """Builds and publishes a new snapshot if the source files changed.
+        Returns whether the snapshot was replaced."""
+        if self.shared_directory:
+            version = shared.current_version(self.shared_directory)
+        else:
+            version = data_version(self.parser)
+        if version is None or version == self.current.version:
+            return False
+
+        old = self.current
+        start = time.perf_counter()
+        if self.shared_directory:
+            new = shared.attach(self.parser, self.shared_directory)
+            if new is None:
+                return False
+        else:
+            # Rows appended by update_data only extend a copy of the current
+            # snapshot, anything else takes a full build
+            new = old.refreshed()
+            if new is None:
+                new = DataLoader(self.parser)
+            # The files may have been replaced while they were read, keep the
+            # current snapshot and build again on the next check
+            if new.version is None or data_version(self.parser) != new.version:
+                return False
+        self.build_seconds = time.perf_counter() - start
+        self.loaded_at = time.time()
+        self.current = new
+        for listener in self.listeners:
+            listener(old, self.current)
+        return True
+
+    def __run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.check()
+            except Exception as e:
+                # Keep serving the last good snapshot
+                print("Refreshing the data failed: {}".format(e))
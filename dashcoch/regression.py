@@ -0,0 +1,97 @@
+"""Least squares regression of one variable on another, computed in closed
+form, so the app does not need to import scipy for ``stats.linregress``."""
+import math
+import numpy as np
+
+# As scipy, keeps the t statistic finite for a perfect correlation
+TINY = 1.0e-20
+
+
+def linregress(x, y):
+    """Returns the slope, the intercept, the correlation coefficient r, the
+    two-sided p-value of the hypothesis that the slope is zero and the
+    standard error of the slope, like ``scipy.stats.linregress``."""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if x.size == 0 or y.size == 0:
+        raise ValueError("Inputs must not be empty.")
+    if len(x) > 1 and x.max() == x.min():
+        raise ValueError(
+            "Cannot calculate a linear regression if all x values are identical"
+        )
+
+    n = len(x)
+    xmean = x.mean()
+    ymean = y.mean()
+    # Mean squares and mean product of the deviations
+    ssxm, ssxym, _, ssym = np.cov(x, y, bias=1).flat
+
+    # As the scipy 1.4.1 this replaced, r is zero for a constant y, where
+    # newer releases return NaN
+    if ssxm == 0.0 or ssym == 0.0:
+        r = 0.0
+    else:
+        r = min(1.0, max(-1.0, ssxym / math.sqrt(ssxm * ssym)))
+
+    slope = ssxym / ssxm
+    intercept = ymean - slope * xmean
+    if n == 2:
+        p_value = 1.0 if y[0] == y[1] else 0.0
+        std_err = 0.0
+    else:
+        df = n - 2
+        t = r * math.sqrt(df / ((1.0 - r + TINY) * (1.0 + r + TINY)))
+        p_value = t_two_sided(t, df)
+        std_err = math.sqrt((1 - r ** 2) * ssym / ssxm / df)
+    return slope, intercept, r, p_value, std_err
+
+
+def t_two_sided(t, df):
+    """P(|T| >= |t|) for Student's t distribution with ``df`` degrees of
+    freedom, which is the regularized incomplete beta function
+    I_x(df / 2, 1 / 2) at x = df / (df + t^2)."""
+    if math.isnan(t):
+        return math.nan
+    return betainc(df / 2.0, 0.5, df / (df + t * t))
+
+
+def betainc(a, b, x):
+    """The regularized incomplete beta function I_x(a, b)."""
+    if x <= 0.0:
+        return 0.0
+    if x >= 1.0:
+        return 1.0
+    front = math.exp(
+        math.lgamma(a + b)
+        - math.lgamma(a)
+        - math.lgamma(b)
+        + a * math.log(x)
+        + b * math.log1p(-x)
+    )
+    # The continued fraction converges quickly on this side of the mean
+    if x < (a + 1.0) / (a + b + 2.0):
+        return front * _betacf(a, b, x) / a
+    return 1.0 - front * _betacf(b, a, 1.0 - x) / b
+
+
+def _betacf(a, b, x, eps=1e-16, max_iterations=500):
+    # Continued fraction of the incomplete beta function, evaluated with the
+    # modified Lentz method
+    tiny = 1e-300
+    c = 1.0
+    d = 1.0 - (a + b) * x / (a + 1.0)
+    d = 1.0 / (d if abs(d) > tiny else tiny)
+    h = d
+    for m in range(1, max_iterations + 1):
+        for numerator in (
+            m * (b - m) * x / ((a + 2 * m - 1.0) * (a + 2 * m)),
+            -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 2 * m + 1.0)),
+        ):
+            d = 1.0 + numerator * d
+            d = 1.0 / (d if abs(d) > tiny else tiny)
+            c = 1.0 + numerator / c
+            c = c if abs(c) > tiny else tiny
+            h *= d * c
+        if abs(d * c - 1.0) < eps:
+            break
+    return h
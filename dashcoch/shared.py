@@ -0,0 +1,270 @@
+"""Read-only dataset snapshots shared between processes through memory-mapped
+files.
+
+A single builder process computes a DataLoader and publishes all of its frames
+to ``<directory>/<version>/`` as plain .npy files, one matrix per frame and
+dtype. Workers attach to the snapshot named in ``<directory>/current``: the
+numeric matrices are memory-mapped read-only, so every worker shares the same
+physical pages instead of holding its own copy. Only indices and text columns
+(dates, labels) are materialized per worker.
+
+The deferred attributes, the world series and the regressions, are computed
+by the builder too, so workers do not each download and reduce the world
+series when the world section is first shown.
+
+    python -m dashcoch.shared [--watch]
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from configparser import ConfigParser
+import numpy as np
+import pandas as pd
+from .data_loader import DataLoader, data_version
+from .derived import derived_attributes
+
+
+def current_version(directory: str):
+    """Version of the last published snapshot, or None."""
+    try:
+        with open(os.path.join(directory, "current")) as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def publish(loader: DataLoader, directory: str):
+    """Writes every frame and series of ``loader`` as a new snapshot and makes
+    it the current one, after computing its deferred attributes. The previous
+    snapshot is kept for workers that are still reading it, older ones are
+    removed."""
+    deferred = [
+        name
+        for name, attribute in derived_attributes(type(loader)).items()
+        if attribute.deferred
+    ]
+    for name in deferred:
+        try:
+            getattr(loader, name)
+        except Exception as e:
+            # Left to the workers, e.g. while the world series cannot be
+            # downloaded
+            print("Not sharing {}: {}".format(name, e))
+
+    previous = current_version(directory)
+    path = os.path.join(directory, loader.version)
+    tmp = os.path.join(directory, "." + loader.version + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    meta = {}
+    for name, value in vars(loader).items():
+        if isinstance(value, pd.Series):
+            meta[name] = _write_frame(tmp, name, value.to_frame())
+            meta[name]["series"] = value.name
+        elif isinstance(value, pd.DataFrame):
+            meta[name] = _write_frame(tmp, name, value)
+        elif name in deferred:
+            # The regressions, a few numbers kept in the metadata
+            meta[name] = {"value": value}
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump(meta, f)
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp, path)
+    with open(os.path.join(directory, "current.tmp"), "w") as f:
+        f.write(loader.version)
+    os.replace(
+        os.path.join(directory, "current.tmp"), os.path.join(directory, "current")
+    )
+
+    for entry in os.listdir(directory):
+        if entry not in (loader.version, previous, "current") and os.path.isdir(
+            os.path.join(directory, entry)
+        ):
+            shutil.rmtree(os.path.join(directory, entry), ignore_errors=True)
+
+
+def attach(parser: ConfigParser, directory: str):
+    """Returns a lazy DataLoader on the current snapshot, or None if nothing
+    has been published yet."""
+    version = current_version(directory)
+    if version is None:
+        return None
+    path = os.path.join(directory, version)
+    try:
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    frames = {}
+    for name, frame_meta in meta.items():
+        if "value" in frame_meta:
+            frames[name] = frame_meta["value"]
+            continue
+        df = _read_frame(path, name, frame_meta)
+        if "series" in frame_meta:
+            df = df.iloc[:, 0].rename(frame_meta["series"])
+        frames[name] = df
+    return DataLoader.from_frames(parser, version, frames)
+
+
+def publish_forever(settings: str, interval: float):
+    """Publishes a new snapshot whenever the source files change."""
+    parser = ConfigParser()
+    parser.read(settings)
+    directory = parser.get("shared", "directory")
+    while True:
+        try:
+            version = data_version(parser)
+            if version is not None and version != current_version(directory):
+                data = _build(parser)
+                if data is not None:
+                    publish(data, directory)
+        except Exception as e:
+            print("Publishing the shared snapshot failed: {}".format(e))
+        time.sleep(interval)
+
+
+def start_builder(settings: str):
+    """Publishes a first snapshot, then keeps publishing from a separate
+    process, which is returned. Meant to be called once by the process that
+    forks the workers, e.g. from gunicorn's ``on_starting`` hook, and stopped
+    with ``stop_builder`` in ``on_exit``.
+
+    The builder is an independent process rather than a multiprocessing
+    child: forked workers inherit multiprocessing's exit handler, which
+    would terminate a child of the master when any worker exits."""
+    parser = ConfigParser()
+    parser.read(settings)
+    directory = parser.get("shared", "directory")
+    version = data_version(parser)
+    if version is not None and version != current_version(directory):
+        data = _build(parser)
+        # Otherwise published by the builder once the files are complete
+        if data is not None:
+            publish(data, directory)
+
+    # Importable from wherever this package was imported from
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    path = os.environ.get("PYTHONPATH")
+    return subprocess.Popen(
+        [sys.executable, "-m", "dashcoch.shared", "--watch", "--settings", settings],
+        env=dict(os.environ, PYTHONPATH=root + os.pathsep + path if path else root),
+    )
+
+
+def stop_builder(builder, timeout: float = 10):
+    """Stops a builder started with ``start_builder``."""
+    if builder.poll() is None:
+        builder.terminate()
+        try:
+            builder.wait(timeout)
+        except subprocess.TimeoutExpired:
+            builder.kill()
+            builder.wait()
+
+
+def _build(parser):
+    """Builds a loader, or returns None if the source files were replaced
+    while they were read, so no snapshot is published under a stale
+    version."""
+    data = DataLoader(parser)
+    if data.version is None or data_version(parser) != data.version:
+        return None
+    return data
+
+
+def _write_frame(path, name, df):
+    meta = {
+        "columns": list(df.columns),
+        "columns_name": df.columns.name,
+        "index_name": df.index.name,
+        "blocks": [],
+    }
+    if isinstance(df.index, pd.RangeIndex):
+        meta["range"] = [df.index.start, df.index.stop, df.index.step]
+    else:
+        _save(os.path.join(path, name + ".index.npy"), df.index.values)
+
+    groups = {}
+    for column, dtype in df.dtypes.items():
+        groups.setdefault(str(dtype), []).append(column)
+    for i, (dtype, columns) in enumerate(groups.items()):
+        file_name = "{}.{}.npy".format(name, i)
+        _save(os.path.join(path, file_name), df[columns].values)
+        meta["blocks"].append(
+            {"file": file_name, "dtype": dtype, "columns": columns}
+        )
+    return meta
+
+
+def _read_frame(path, name, meta):
+    if "range" in meta:
+        index = pd.RangeIndex(*meta["range"], name=meta["index_name"])
+    else:
+        index = pd.Index(
+            _load(os.path.join(path, name + ".index.npy")), name=meta["index_name"]
+        )
+    blocks = [
+        pd.DataFrame(
+            _load(os.path.join(path, block["file"])),
+            index=index,
+            columns=block["columns"],
+            copy=False,
+        )
+        for block in meta["blocks"]
+    ]
+    df = blocks[0] if len(blocks) == 1 else pd.concat(blocks, axis=1, copy=False)
+    if list(df.columns) != meta["columns"]:
+        # Interleaved dtypes cannot be reordered without a copy
+        df = df[meta["columns"]]
+    df.columns.name = meta["columns_name"]
+    return df
+
+
+def _save(path, array):
+    if array.dtype == object:
+        # Text is stored as fixed width unicode, as object arrays would
+        # have to be pickled
+        array = array.astype(str)
+    np.save(path, array)
+
+
+def _load(path):
+    array = np.load(path, mmap_mode="r")
+    if array.dtype.kind == "U":
+        return array.astype(object)
+    return array
+
+
+def main():
+    argparser = argparse.ArgumentParser(
+        description="Publishes the shared dataset snapshot."
+    )
+    argparser.add_argument("--settings", default="settings.ini")
+    argparser.add_argument(
+        "--watch", action="store_true", help="keep publishing when the data changes"
+    )
+    args = argparser.parse_args()
+
+    parser = ConfigParser()
+    parser.read(args.settings)
+    if args.watch:
+        publish_forever(
+            args.settings, parser.getfloat("data", "refresh_interval", fallback=60)
+        )
+    else:
+        data = _build(parser)
+        if data is None:
+            sys.exit("The data files changed while they were read, try again")
+        publish(data, parser.get("shared", "directory"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""Updates several data_AT CSVs and their binary copies as one transaction.
+
+The new contents are written next to the files first. Then a marker listing
+them is written, the files are renamed into place and their binary copies are
+updated, and the marker is removed. While the marker exists, ``data_version``
+returns None, so readers keep the snapshot they have instead of loading a mix
+of old and new files. If the process dies after writing the marker, the next
+``commit`` or ``recover`` completes the renames.
+
+Files that rows were only appended to are recorded in a journal, so readers
+holding an older copy can read just the changed lines with ``appended``.
+"""
+import io
+import json
+import os
+import shutil
+import tempfile
+import pandas as pd
+from . import columnar
+
+MARKER = ".update-in-progress"
+JOURNAL = ".appends.json"
+# Appends kept in the journal per file
+JOURNAL_LENGTH = 16
+
+
+def in_progress(path: str):
+    """Whether a transaction is writing the directory of ``path``."""
+    return os.path.exists(_marker(path))
+
+
+def appended(path: str, since, stat):
+    """Reads the rows appended to ``path`` between the file states ``since``
+    and ``stat``, each given as ``(st_size, st_mtime_ns)``. The rows include
+    the ones replaced at the end of the file. Returns None if the file was
+    changed otherwise in between, or by anything but ``commit``."""
+    entries = _read_journal(path).get(os.path.basename(path), [])
+    current = list(since)
+    offset = None
+    for _ in entries:
+        if current == list(stat):
+            break
+        entry = next((e for e in entries if e["base"] == current), None)
+        if entry is None:
+            return None
+        # Later appends start at or after the lines of earlier ones
+        offset = entry["offset"] if offset is None else min(offset, entry["offset"])
+        current = entry["stat"]
+    if current != list(stat) or offset is None:
+        return None
+
+    with open(path, "rb") as f:
+        header = f.readline()
+        f.seek(offset)
+        tail = f.read()
+    return pd.read_csv(io.BytesIO(header + tail))
+
+
+def commit(rows: dict):
+    """Adds rows to the files, given as ``{csv_path: {"Date": ..., column:
+    value}}`` for one row or ``{csv_path: df}`` for several. Rows replace the
+    rows of the same date.
+
+    If a file is sorted by date and the rows are not older than its last one,
+    they are appended, replacing the last line if it has the date of the
+    first one; otherwise their lines are merged into the file by date. Either
+    way, the lines of other dates are kept byte for byte, and so is whether
+    the file ends with a line break. A file that does not exist yet is
+    created with the columns of its rows."""
+    directories = {os.path.dirname(path) for path in rows}
+    if len(directories) != 1:
+        raise ValueError("The files of a transaction have to share a directory")
+    recover(rows)
+
+    staged = [
+        _stage(path, df if isinstance(df, pd.DataFrame) else pd.DataFrame([df]))
+        for path, df in rows.items()
+    ]
+
+    marker = _marker(next(iter(rows)))
+    with open(marker + ".tmp", "w") as f:
+        json.dump([[tmp, path] for path, tmp, _, _ in staged], f)
+    os.replace(marker + ".tmp", marker)
+
+    for path, tmp, _, _ in staged:
+        os.replace(tmp, path)
+    _record_appends(staged)
+    for path, _, df, _ in staged:
+        columnar.write(df, path)
+    os.remove(marker)
+
+
+def recover(paths):
+    """Completes a transaction on the directory of ``paths`` that was
+    interrupted after its marker was written. Returns whether there was
+    one."""
+    marker = _marker(next(iter(paths)))
+    try:
+        with open(marker) as f:
+            staged = json.load(f)
+    except FileNotFoundError:
+        return False
+
+    for tmp, path in staged:
+        if os.path.exists(tmp):
+            os.replace(tmp, path)
+    for _, path in staged:
+        columnar.write(pd.read_csv(path), path)
+    os.remove(marker)
+    return True
+
+
+def _stage(path, rows):
+    """Writes the new content of ``path`` to a temporary file. Returns the
+    path, the temporary path, the new frame and, if the rows were appended,
+    the state of the file before and the offset of the first changed line."""
+    tmp = path + ".tmp"
+    rows = (
+        rows.drop_duplicates("Date", keep="last")
+        .sort_values("Date", kind="mergesort")
+        .reset_index(drop=True)
+    )
+    if not os.path.exists(path):
+        rows[["Date"] + [c for c in rows.columns if c != "Date"]].to_csv(
+            tmp, index=False
+        )
+        return path, tmp, pd.read_csv(tmp), None
+
+    base = os.stat(path)
+    old = columnar.load(path)
+    new = rows.reindex(columns=old.columns)
+    lines = [_line(row) for row in new.values]
+    # The new rows as read_csv reads them from the file, so the binary copy
+    # gets the column types the CSV is read with
+    added = pd.read_csv(io.StringIO("\n".join([",".join(old.columns)] + lines)))
+    dates = old["Date"]
+    first = new["Date"].iloc[0]
+    if len(old) and dates.is_monotonic_increasing and first >= dates.iloc[-1]:
+        replace = first == dates.iloc[-1]
+        shutil.copyfile(path, tmp)
+        offset = _append_lines(tmp, lines, replace)
+        if offset is not None:
+            kept = old.iloc[:-1] if replace else old
+            df = pd.concat([kept, added], ignore_index=True)
+            return path, tmp, df, ([base.st_size, base.st_mtime_ns], offset)
+
+    df = (
+        pd.concat([old[~old["Date"].isin(added["Date"])], added])
+        .sort_values("Date", kind="mergesort")
+        .reset_index(drop=True)
+    )
+    _merge_lines(path, tmp, new["Date"], lines)
+    return path, tmp, df, None
+
+
+def _append_lines(path, lines, replace, chunk=65536):
+    """Appends ``lines`` to the file, replacing its last line if ``replace``.
+    Returns the offset of the first new line, or None if the last line could
+    not be found."""
+    with open(path, "r+b") as f:
+        size = f.seek(0, os.SEEK_END)
+        f.seek(max(0, size - chunk))
+        tail = f.read()
+        newline = _newline(tail.decode("utf-8", "replace")).encode()
+        ending = newline if tail.endswith(newline) else b""
+        # End of the last line, without its line break
+        end = size - len(ending)
+        if replace:
+            start = tail.rfind(newline, 0, len(tail) - len(ending))
+            if start < 0:
+                return None
+            end = size - len(tail) + start
+        f.truncate(end)
+        f.seek(end)
+        f.write(newline + newline.join(line.encode() for line in lines) + ending)
+    return end + len(newline)
+
+
+def _merge_lines(path, tmp, dates, lines):
+    """Writes the lines of ``path`` to ``tmp`` with ``lines``, the lines of
+    ``dates``, replacing or inserted between them by date, sorted by date."""
+    with open(path, encoding="utf-8", newline="") as f:
+        text = f.read()
+    newline = _newline(text)
+    header, *kept = text.splitlines()
+    replaced = set(dates)
+    # Dates are ISO strings, which sort like the dates
+    merged = [
+        (line.split(",", 1)[0], line)
+        for line in kept
+        if line and line.split(",", 1)[0] not in replaced
+    ] + list(zip(dates, lines))
+    merged.sort(key=lambda dated: dated[0])
+    with open(tmp, "w", encoding="utf-8", newline="") as f:
+        f.write(newline.join([header] + [line for _, line in merged]))
+        if text.endswith(("\n", "\r")):
+            f.write(newline)
+
+
+def _newline(text):
+    # The line break a file uses, to keep it when lines are added
+    return "\r\n" if "\r\n" in text else "\n"
+
+
+def _line(values):
+    return ",".join(_value(value) for value in values)
+
+
+def _value(value):
+    if pd.isna(value):
+        return ""
+    # Columns with a missing value are read as floats, their counts are
+    # still written as integers
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _record_appends(staged):
+    if all(append is None for _, _, _, append in staged):
+        return
+    journal = _read_journal(staged[0][0])
+    for path, _, _, append in staged:
+        if append is None:
+            continue
+        base, offset = append
+        stat = os.stat(path)
+        entries = journal.setdefault(os.path.basename(path), [])
+        entries.append(
+            {"base": base, "stat": [stat.st_size, stat.st_mtime_ns], "offset": offset}
+        )
+        del entries[:-JOURNAL_LENGTH]
+
+    directory = os.path.dirname(staged[0][0])
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(journal, f)
+        os.replace(tmp, os.path.join(directory, JOURNAL))
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
+def _read_journal(path):
+    try:
+        with open(os.path.join(os.path.dirname(path), JOURNAL)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _marker(path):
+    return os.path.join(os.path.dirname(path), MARKER)
@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+
+
+def moving_totals(df: pd.DataFrame, windows=(7,)):
+    """Trailing N-day totals of every column of ``df`` for each window length.
+
+    Row i of a total is the sum of rows i - N + 1 to i, missing values counting
+    as zero, like ``df.iloc[i - N + 1 : i + 1].sum()``. All windows are taken
+    from a single cumulative sum, so the cost is linear in the history length
+    regardless of the number of windows. Returns a dict keyed by window length.
+    """
+    cumulative = np.cumsum(df.fillna(0).values.astype(float), axis=0)
+    dates = pd.to_datetime(df.index)
+    end_labels = np.array(dates.strftime("%d. %m."), dtype=object)
+
+    totals = {}
+    for days in windows:
+        values = cumulative.copy()
+        values[days:] -= cumulative[:-days]
+        total = pd.DataFrame(values, index=df.index, columns=df.columns)
+
+        # Add the label for the date range (previous window)
+        start_labels = np.array(
+            (dates - pd.Timedelta(days=days)).strftime("%d. %m."), dtype=object
+        )
+        total["date_label"] = start_labels + " – " + end_labels
+        totals[days] = total
+    return totals
+
+
+def moving_total(df: pd.DataFrame, days: int = 7):
+    """Trailing ``days``-day totals of every column of ``df``, see
+    ``moving_totals``."""
+    return moving_totals(df, (days,))[days]
@@ -0,0 +1,130 @@
+import hashlib
+import io
+import json
+import os
+import tempfile
+import time
+import zipfile
+from urllib import request
+from urllib.error import HTTPError, URLError
+import numpy as np
+import pandas as pd
+
+
+class WorldCache:
+    """On-disk cache of the reduced JHU world time series.
+
+    Only the frame returned by ``reduce`` is stored, as a numpy archive next to
+    a small JSON file holding the HTTP validators and a hash of the source.
+    Within ``max_age`` seconds the cached frame is used as is. After that the
+    source is revalidated with a conditional request, and a download whose
+    content hash did not change is not reduced again. If the source cannot be
+    reached, the last good copy is used. A cached frame that cannot be read
+    is fetched again.
+    """
+
+    def __init__(self, directory: str, max_age: float = 3600, timeout: float = 10):
+        self.directory = directory
+        self.max_age = max_age
+        self.timeout = timeout
+
+    def load(self, url: str, reduce):
+        if not url.startswith(("http://", "https://")):
+            return reduce(pd.read_csv(url))
+
+        name = hashlib.sha1(url.encode()).hexdigest()[:12]
+        data_path = os.path.join(self.directory, name + ".npz")
+        meta_path = os.path.join(self.directory, name + ".json")
+        meta = self.__read_meta(meta_path)
+        cached_df = None if meta is None else self.__read_frame(data_path, meta)
+        cached = cached_df is not None
+
+        if cached and time.time() - meta["checked"] < self.max_age:
+            return cached_df
+
+        headers = {}
+        if cached and meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if cached and meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+        try:
+            with request.urlopen(
+                request.Request(url, headers=headers), timeout=self.timeout
+            ) as response:
+                body = response.read()
+                etag = response.headers.get("ETag")
+                last_modified = response.headers.get("Last-Modified")
+        except HTTPError as e:
+            if e.code == 304 and cached:
+                meta["checked"] = time.time()
+                self.__write_meta(meta_path, meta)
+                return cached_df
+            if cached:
+                print("Using cached {} ({})".format(url, e))
+                return cached_df
+            raise
+        except (URLError, OSError) as e:
+            if cached:
+                print("Using cached {} ({})".format(url, e))
+                return cached_df
+            raise
+
+        digest = hashlib.sha1(body).hexdigest()
+        if cached and digest == meta.get("sha1"):
+            df = cached_df
+        else:
+            df = reduce(pd.read_csv(io.BytesIO(body)))
+            self.__write_frame(data_path, df)
+
+        self.__write_meta(
+            meta_path,
+            {
+                "url": url,
+                "etag": etag,
+                "last_modified": last_modified,
+                "sha1": digest,
+                "checked": time.time(),
+                "columns_name": df.columns.name,
+            },
+        )
+        return df
+
+    def __read_meta(self, path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def __write_meta(self, path, meta):
+        self.__replace(path, json.dumps(meta).encode())
+
+    def __read_frame(self, path, meta):
+        try:
+            with np.load(path, allow_pickle=False) as archive:
+                df = pd.DataFrame(archive["values"], columns=list(archive["columns"]))
+        except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+            # Missing, truncated or not an archive written by this cache
+            return None
+        df.columns.name = meta.get("columns_name")
+        return df
+
+    def __write_frame(self, path, df):
+        buffer = io.BytesIO()
+        np.savez(
+            buffer, values=df.values, columns=np.array(df.columns, dtype=str)
+        )
+        self.__replace(path, buffer.getvalue())
+
+    def __replace(self, path, content):
+        os.makedirs(self.directory, exist_ok=True)
+        # Unique per writer, as several workers may refresh the same entry
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(content)
+            os.replace(tmp, path)
+        except BaseException:
+            os.remove(tmp)
+            raise
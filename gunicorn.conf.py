@@ -0,0 +1,18 @@
+from configparser import ConfigParser
+from dashcoch import shared
+
+builder = None
+
+
+def on_starting(server):
+    # Build the shared dataset once in the master, before the workers fork
+    global builder
+    parser = ConfigParser()
+    parser.read("settings.ini")
+    if parser.get("shared", "directory", fallback=""):
+        builder = shared.start_builder("settings.ini")
+
+
+def on_exit(server):
+    if builder is not None:
+        shared.stop_builder(builder)
@@ -0,0 +1,137 @@
+import os
+import shutil
+from configparser import ConfigParser
+import pandas as pd
+from dashcoch import DataLoader, refresher, transaction
+from dashcoch.data_loader import data_version
+from dashcoch.derived import derived_attributes
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOURCES = [
+    "swiss_cases",
+    "swiss_fatalities",
+    "swiss_hospitalizations",
+    "swiss_icu",
+    "swiss_releases",
+]
+
+
+def settings(directory):
+    """A copy of settings.ini reading copies of the files of data_AT in
+    ``directory``."""
+    parser = ConfigParser()
+    parser.read(os.path.join(ROOT, "settings.ini"))
+    for name, path in parser.items("urls"):
+        if not path.startswith(("http://", "https://")):
+            copy = os.path.join(directory, os.path.basename(path))
+            if os.path.exists(os.path.join(ROOT, path)):
+                shutil.copyfile(os.path.join(ROOT, path), copy)
+            parser.set("urls", name, copy)
+    parser.set("cache", "directory", os.path.join(directory, ".cache"))
+    return parser
+
+
+def assert_same(loader, reference):
+    compared = 0
+    for name, attribute in derived_attributes(DataLoader).items():
+        if attribute.deferred:
+            continue
+        actual, expected = getattr(loader, name), getattr(reference, name)
+        if isinstance(expected, pd.DataFrame):
+            pd.testing.assert_frame_equal(actual, expected, check_exact=False)
+        elif isinstance(expected, pd.Series):
+            pd.testing.assert_series_equal(actual, expected, check_exact=False)
+        else:
+            assert actual == expected, name
+        compared += 1
+    assert compared > 0
+
+
+def test_extend_matches_rebuild(tmp_path):
+    parser = settings(str(tmp_path))
+    full = {name: pd.read_csv(parser.get("urls", name)) for name in SOURCES}
+    # The loader starts without the last three days
+    for name, df in full.items():
+        df.iloc[:-3].to_csv(parser.get("urls", name), index=False)
+    loader = DataLoader(parser)
+
+    rows = {}
+    for name, df in full.items():
+        df = df.copy()
+        # Corrects a day in the middle of the series
+        middle = len(df) // 2
+        df.loc[middle, df.columns[-1]] += 7
+        df.to_csv(parser.get("urls", name), index=False)
+        rows[name] = df.iloc[[middle] + list(range(len(df) - 3, len(df)))]
+    loader.extend(**rows)
+
+    assert_same(loader, DataLoader(parser))
+
+
+def test_extend_lazy_matches_rebuild(tmp_path):
+    parser = settings(str(tmp_path))
+    loader = DataLoader(parser, lazy=True)
+    # Computed before the extension, so it is extended rather than rebuilt
+    loader.swiss_cases_by_date_filled_per_capita
+
+    df = pd.read_csv(parser.get("urls", "swiss_cases"))
+    df.loc[len(df) - 10, "W"] += 100
+    df.to_csv(parser.get("urls", "swiss_cases"), index=False)
+    loader.extend(swiss_cases=df.iloc[[len(df) - 10]])
+
+    assert_same(loader, DataLoader(parser))
+
+
+def next_rows(parser, names, date, corrected=1):
+    """A new ``date`` for each of the files ``names``, and the day
+    ``corrected`` from its end again with its last column changed."""
+    rows = {}
+    for name in names:
+        df = pd.read_csv(parser.get("urls", name))
+        day = df.iloc[[-corrected]].copy()
+        day[df.columns[-1]] += 3
+        new = df.iloc[[-1]].copy()
+        new["Date"] = date
+        rows[parser.get("urls", name)] = pd.concat([day, new])
+    return rows
+
+
+def test_refresher_extends_appended_rows(tmp_path, monkeypatch):
+    parser = settings(str(tmp_path))
+    r = refresher.DataRefresher(parser, interval=0, lazy=True)
+    old = r.current
+    cases = len(old.swiss_cases)
+
+    builds = []
+    monkeypatch.setattr(
+        refresher, "DataLoader", lambda *args: builds.append(args) or DataLoader(*args)
+    )
+    transaction.commit(next_rows(parser, SOURCES[:3], "2099-01-01"))
+    assert r.check()
+    # Two appends to the cases between checks
+    transaction.commit(next_rows(parser, SOURCES, "2099-01-02"))
+    transaction.commit(next_rows(parser, SOURCES[:1], "2099-01-03"))
+    assert r.check()
+
+    assert builds == []
+    assert r.current is not old
+    assert len(old.swiss_cases) == cases
+    assert r.current.version == data_version(parser)
+    assert not r.check()
+    assert_same(r.current, DataLoader(parser))
+
+
+def test_refresher_rebuilds_changed_rows(tmp_path, monkeypatch):
+    parser = settings(str(tmp_path))
+    r = refresher.DataRefresher(parser, interval=0)
+
+    builds = []
+    monkeypatch.setattr(
+        refresher, "DataLoader", lambda *args: builds.append(args) or DataLoader(*args)
+    )
+    # Older than the last day, so the files are rewritten
+    transaction.commit(next_rows(parser, SOURCES[:1], "2099-01-01", corrected=10))
+    assert r.check()
+
+    assert len(builds) == 1
+    assert_same(r.current, DataLoader(parser))
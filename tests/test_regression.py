@@ -0,0 +1,74 @@
+import warnings
+import numpy as np
+import pandas as pd
+import pytest
+from dashcoch import DataLoader, regression
+from .test_data_loader import settings
+
+stats = pytest.importorskip("scipy.stats")
+
+FIELDS = ["slope", "intercept", "r_value", "p_value", "std_err"]
+
+EDGE_CASES = {
+    "constant y": ([1.0, 2.0, 3.0, 4.0], [5.0, 5.0, 5.0, 5.0]),
+    "two points": ([1.0, 2.0], [3.0, 7.0]),
+    "two points, constant y": ([1.0, 2.0], [3.0, 3.0]),
+    "three points": ([1.0, 2.0, 4.0], [2.0, 1.0, 5.0]),
+    "perfect correlation": ([1.0, 2.0, 3.0, 4.0, 5.0], [2.0, 4.0, 6.0, 8.0, 10.0]),
+    "perfect anticorrelation": ([1.0, 2.0, 3.0], [3.0, 2.0, 1.0]),
+    "short series": ([0.5, 1.5, 2.0, 7.0], [1.0, 0.2, 3.3, 2.0]),
+}
+
+
+def assert_equivalent(x, y):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        expected = tuple(stats.linregress(x, y))[:5]
+    if np.ptp(y) == 0 and np.isnan(expected[2]):
+        # Newer scipy returns NaN for a constant y, the 1.4.1 pinned in
+        # requirements-dev.txt no correlation and no standard error
+        expected = expected[:2] + (0.0, 1.0, 0.0)
+    result = regression.linregress(x, y)
+    # slope, intercept, r, p-value and standard error
+    np.testing.assert_allclose(result, expected, rtol=1e-9, atol=1e-300)
+
+
+@pytest.mark.parametrize("name", sorted(EDGE_CASES))
+def test_edge_cases(name):
+    assert_equivalent(*EDGE_CASES[name])
+
+
+def test_random_samples():
+    rng = np.random.RandomState(0)
+    for n in [3, 5, 9, 30, 1000]:
+        for _ in range(20):
+            x = rng.lognormal(size=n) * 100
+            y = rng.normal() * x + rng.normal(size=n) * x.std()
+            assert_equivalent(x, y)
+
+
+def test_loader_regressions(tmp_path):
+    data = DataLoader(settings(str(tmp_path)), lazy=True)
+    regressions = [
+        (
+            data.prevalence_density_regression,
+            data.swiss_demography["Density"],
+            data.swiss_cases_by_date_filled_per_capita.iloc[-1],
+        ),
+        (
+            data.cfr_age_regression,
+            data.swiss_demography["O65"],
+            data.swiss_case_fatality_rates.iloc[-1],
+        ),
+    ]
+    for result, x, y in regressions:
+        df = pd.DataFrame([x, y]).dropna(axis=1, how="any")
+        expected = stats.linregress(df.iloc[0], df.iloc[1])
+        np.testing.assert_allclose(
+            [result[field] for field in FIELDS], tuple(expected)[:5], rtol=1e-9
+        )
+
+
+def test_identical_x():
+    with pytest.raises(ValueError):
+        regression.linregress([2.0, 2.0, 2.0], [1.0, 2.0, 3.0])
@@ -0,0 +1,82 @@
+import json
+import dash
+import dash_core_components as dcc
+import dash_html_components as html
+import numpy as np
+import pandas as pd
+import plotly
+import plotly.graph_objs as go
+import pytest
+from dash.dependencies import Input, Output
+from dash.exceptions import PreventUpdate
+from dashcoch import serialization
+
+
+def legacy_dumps(obj):
+    return json.dumps(obj, cls=plotly.utils.PlotlyJSONEncoder)
+
+
+def canonical(body):
+    return json.dumps(json.loads(body), separators=(",", ":"), ensure_ascii=False)
+
+
+dates = pd.Series(["2020-03-01", "2020-03-02", "2020-03-03"])
+cases = pd.Series([1.0, np.nan, 1e-05], index=pd.DatetimeIndex(dates))
+
+VALUES = {
+    "series": cases,
+    "index": cases.index,
+    "strings": dates,
+    "ints": pd.Series([1, 2, 3]),
+    "int32": np.arange(3, dtype="int32"),
+    "bools": np.array([True, False]),
+    "column": np.arange(6.0).reshape(3, 2)[:, 1],
+    "matrix": np.array([[1.5, np.nan], [np.inf, -np.inf]]),
+    "scalars": [np.int64(3), np.float64(np.nan), pd.Timestamp("2020-03-01"), None],
+    "keys": {1: "a", 2.5: "b"},
+    "figure": go.Figure(
+        data=[go.Scatter(x=cases.index, y=cases, name="W")],
+        layout=go.Layout(title="Cases", xaxis={"range": [cases.index[0], "2020-04"]}),
+    ),
+}
+
+
+@pytest.mark.parametrize("key", sorted(VALUES))
+def test_dumps_matches_plotly_encoder(key):
+    value = {"response": {"props": {"figure": VALUES[key]}}}
+    assert canonical(serialization.dumps(value)) == canonical(legacy_dumps(value))
+
+
+def test_dumps_without_orjson(monkeypatch):
+    monkeypatch.setattr(serialization, "orjson", None)
+    assert serialization.dumps(VALUES["figure"]) == legacy_dumps(VALUES["figure"])
+
+
+def test_serialize_callbacks():
+    app = dash.Dash(__name__)
+    app.layout = html.Div(
+        [dcc.Input(id="in"), dcc.Graph(id="graph"), html.Div(id="a"), html.Div(id="b")]
+    )
+
+    @app.callback(Output("graph", "figure"), [Input("in", "value")])
+    def figure(value):
+        return VALUES["figure"]
+
+    @app.callback(
+        [Output("a", "children"), Output("b", "children")], [Input("in", "value")]
+    )
+    def texts(value):
+        return value, dash.no_update
+
+    serialization.serialize_callbacks(app)
+    single = app.callback_map["graph.figure"]["callback"]
+    multi = app.callback_map["..a.children...b.children.."]["callback"]
+
+    expected = legacy_dumps({"response": {"props": {"figure": VALUES["figure"]}}})
+    assert canonical(single("x")) == canonical(expected)
+    assert json.loads(multi("x")) == {
+        "response": {"a": {"children": "x"}},
+        "multi": True,
+    }
+    with pytest.raises(PreventUpdate):
+        multi(dash.no_update)
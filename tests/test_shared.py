@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+from dashcoch import DataLoader, shared
+from .test_data_loader import settings
+
+COUNTRIES = [
+    "France",
+    "Germany",
+    "Italy",
+    "Korea, South",
+    "Spain",
+    "US",
+    "United Kingdom",
+    "Switzerland",
+]
+
+
+def world_series(path, days=60, scale=1):
+    """A time series in the format of the JHU CSVs, growing in every
+    country."""
+    dates = [
+        "{}/{}/{:%y}".format(day.month, day.day, day)
+        for day in pd.date_range("2020-02-01", periods=days)
+    ]
+    growth = np.arange(1, days + 1) ** 2 * scale
+    rows = [
+        ["", country, 0.0, 0.0] + list(growth * (i + 1))
+        for i, country in enumerate(COUNTRIES)
+    ]
+    columns = ["Province/State", "Country/Region", "Lat", "Long"] + list(dates)
+    pd.DataFrame(rows, columns=columns).to_csv(path, index=False)
+
+
+def shared_settings(tmp_path):
+    parser = settings(str(tmp_path))
+    for name, scale in [("world_cases", 100), ("world_fatalities", 2)]:
+        path = str(tmp_path / (name + ".csv"))
+        world_series(path, scale=scale)
+        parser.set("urls", name, path)
+    parser.set("shared", "directory", str(tmp_path / "shared"))
+    return parser
+
+
+def test_attach_shares_deferred_attributes(tmp_path):
+    parser = shared_settings(tmp_path)
+    directory = parser.get("shared", "directory")
+    shared.publish(DataLoader(parser), directory)
+    attached = shared.attach(parser, directory)
+    built = DataLoader(parser, lazy=True)
+
+    for name in [
+        "world_cases",
+        "world_fataltities",
+        "swiss_world_cases_normalized",
+        "swiss_cases_by_date_filled",
+    ]:
+        assert name in vars(attached)
+        pd.testing.assert_frame_equal(
+            getattr(attached, name), getattr(built, name), check_index_type=False
+        )
+    pd.testing.assert_series_equal(
+        attached.world_case_fatality_rate, built.world_case_fatality_rate
+    )
+    for name in ["prevalence_density_regression", "cfr_age_regression"]:
+        assert vars(attached)[name] == getattr(built, name)
+
+
+def test_start_builder_skips_stale_build(tmp_path, monkeypatch):
+    parser = shared_settings(tmp_path)
+    path = str(tmp_path / "settings.ini")
+    with open(path, "w") as f:
+        parser.write(f)
+
+    # The files are replaced during the build
+    versions = iter(["a", "b"])
+    monkeypatch.setattr(shared, "data_version", lambda parser: next(versions))
+    monkeypatch.setattr(
+        shared, "DataLoader", lambda parser: DataLoader.from_frames(parser, "a", {})
+    )
+    published = []
+    monkeypatch.setattr(shared, "publish", lambda *args: published.append(args))
+    monkeypatch.setattr(shared.subprocess, "Popen", lambda *args, **kwargs: None)
+    shared.start_builder(path)
+
+    assert published == []
@@ -0,0 +1,209 @@
+import os
+import shutil
+from configparser import ConfigParser
+import pandas as pd
+import pytest
+from dashcoch import columnar, transaction
+from dashcoch.data_loader import data_version
+
+DATA = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data_AT")
+NAMES = [
+    "covid19_cases_austria.csv",
+    "covid19_fatalities_austria.csv",
+    "covid19_hospitalized_austria.csv",
+    "covid19_icu_austria.csv",
+    "covid19_releases_austria.csv",
+]
+
+
+def copy(tmp_path, name):
+    path = str(tmp_path / name)
+    shutil.copyfile(os.path.join(DATA, name), path)
+    return path
+
+
+def tuple_stat(path):
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def lines(path):
+    with open(path, "rb") as f:
+        return f.read().split(b"\n")
+
+
+def test_rewrite_keeps_other_rows(tmp_path):
+    # Has floats in some rows and no line break at the end
+    path = copy(tmp_path, "covid19_icu_austria.csv")
+    before = lines(path)
+    row = pd.read_csv(path).iloc[200].to_dict()
+    row["W"] = 61
+
+    transaction.commit({path: row})
+
+    after = lines(path)
+    assert len(after) == len(before)
+    changed = [i for i, (a, b) in enumerate(zip(before, after)) if a != b]
+    assert changed == [201]
+    assert after[201] == b"2020-10-09,5,2,16,4,1,5,3,7,61,103"
+    assert after[-1] != b""
+
+
+def test_append_keeps_line_break(tmp_path):
+    for name in ["covid19_icu_austria.csv", "covid19_cases_austria.csv"]:
+        path = copy(tmp_path, name)
+        with open(path, "rb") as f:
+            before = f.read()
+        row = pd.read_csv(path).iloc[-1].to_dict()
+        row["Date"] = "2099-01-01"
+
+        transaction.commit({path: row})
+
+        with open(path, "rb") as f:
+            after = f.read()
+        assert after.endswith(b"\n") == before.endswith(b"\n")
+        assert after.startswith(before.rstrip(b"\n"))
+
+
+def test_commit_updates_files_and_binary_copies(tmp_path):
+    paths = [copy(tmp_path, name) for name in NAMES]
+    rows = {}
+    for path in paths:
+        row = pd.read_csv(path).iloc[-1].to_dict()
+        row["Date"] = "2099-01-01"
+        rows[path] = row
+
+    transaction.commit(rows)
+
+    assert not transaction.in_progress(paths[0])
+    for path in paths:
+        df = pd.read_csv(path)
+        assert df["Date"].iloc[-1] == "2099-01-01"
+        pd.testing.assert_frame_equal(columnar.read(path), df)
+
+
+def test_recover_after_crash(tmp_path, monkeypatch):
+    paths = [copy(tmp_path, name) for name in NAMES]
+    parser = ConfigParser()
+    parser.read_dict({"urls": {"swiss_cases": paths[0]}})
+    rows = {}
+    for path in paths:
+        row = pd.read_csv(path).iloc[-1].to_dict()
+        row["Date"] = "2099-01-01"
+        rows[path] = row
+
+    # Dies after the files were renamed, before the marker is removed
+    def crash(df, path):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(columnar, "write", crash)
+    with pytest.raises(KeyboardInterrupt):
+        transaction.commit(rows)
+    monkeypatch.undo()
+
+    assert transaction.in_progress(paths[0])
+    assert data_version(parser) is None
+    assert all(columnar.read(path) is None for path in paths)
+
+    assert transaction.recover(paths)
+
+    assert not transaction.in_progress(paths[0])
+    assert not transaction.recover(paths)
+    for path in paths:
+        df = pd.read_csv(path)
+        assert df["Date"].iloc[-1] == "2099-01-01"
+        pd.testing.assert_frame_equal(columnar.read(path), df)
+
+
+def test_recover_before_rename(tmp_path, monkeypatch):
+    paths = [copy(tmp_path, name) for name in NAMES]
+    rows = {}
+    for path in paths:
+        row = pd.read_csv(path).iloc[-1].to_dict()
+        row["Date"] = "2099-01-01"
+        rows[path] = row
+
+    # Dies after the marker was written, before the second file is renamed
+    replace = os.replace
+    calls = []
+
+    def crash(src, dst):
+        calls.append(dst)
+        if len(calls) == 3:
+            raise KeyboardInterrupt
+        replace(src, dst)
+
+    monkeypatch.setattr(transaction.os, "replace", crash)
+    with pytest.raises(KeyboardInterrupt):
+        transaction.commit(rows)
+    monkeypatch.undo()
+
+    # The next commit completes it first
+    transaction.commit({paths[0]: dict(rows[paths[0]], Date="2099-01-02")})
+
+    assert not transaction.in_progress(paths[0])
+    for path in paths:
+        dates = list(pd.read_csv(path)["Date"])
+        assert "2099-01-01" in dates
+        assert len(dates) == len(set(dates))
+
+
+def test_crlf_line_breaks(tmp_path):
+    path = copy(tmp_path, "covid19_cases_austria.csv")
+    with open(path, "rb") as f:
+        content = f.read().replace(b"\n", b"\r\n")
+    with open(path, "wb") as f:
+        f.write(content)
+    before = tuple_stat(path)
+    row = pd.read_csv(path).iloc[-1].to_dict()
+
+    # Appended, replacing the last line, appended and merged into the file
+    transaction.commit({path: dict(row, Date="2099-01-01")})
+    appended = transaction.appended(
+        path, before, tuple_stat(path)
+    )
+    assert list(appended["Date"]) == ["2099-01-01"]
+    transaction.commit({path: dict(row, Date="2099-01-01", W=1)})
+    appended = transaction.appended(
+        path, before, tuple_stat(path)
+    )
+    assert list(appended["W"]) == [1]
+    for date in ["2099-01-02", "2020-03-15"]:
+        with open(path, "rb") as f:
+            content = f.read()
+        assert content.endswith(b"\r\n")
+        assert content.count(b"\n") == content.count(b"\r\n")
+        transaction.commit({path: dict(row, Date=date)})
+    pd.testing.assert_frame_equal(columnar.read(path), pd.read_csv(path))
+
+
+def test_binary_copy_types(tmp_path):
+    path = copy(tmp_path, "covid19_cases_austria.csv")
+    df = pd.read_csv(path)
+    assert df["W"].dtype == "int64"
+    # Values as floats, and a missing one, appended and merged
+    row = {c: float(v) for c, v in df.iloc[-1].items() if c != "Date"}
+    transaction.commit({path: dict(row, Date="2099-01-01")})
+    pd.testing.assert_frame_equal(columnar.read(path), pd.read_csv(path))
+    transaction.commit({path: dict(row, Date="2099-01-02", W=None)})
+    pd.testing.assert_frame_equal(columnar.read(path), pd.read_csv(path))
+    transaction.commit({path: dict(row, Date="2020-03-15")})
+    pd.testing.assert_frame_equal(columnar.read(path), pd.read_csv(path))
+
+    new = str(tmp_path / "new.csv")
+    transaction.commit({new: dict(row, Date="2099-01-01")})
+    pd.testing.assert_frame_equal(columnar.read(new), pd.read_csv(new))
+
+
+def test_columnar_write_leaves_no_temporary_files(tmp_path):
+    path = copy(tmp_path, "covid19_cases_austria.csv")
+    df = pd.read_csv(path)
+    columnar.write(df, path)
+    columnar.write(df, path)
+
+    assert sorted(os.listdir(columnar.path_for(path))) == [
+        "dates.npy",
+        "meta.json",
+        "values.npy",
+    ]
+    pd.testing.assert_frame_equal(columnar.read(path), df)
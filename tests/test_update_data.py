@@ -0,0 +1,48 @@
+import os
+import update_data
+from benchmarks.scraping import legacy_retrieve, legacy_retrieve_districts
+
+FIXTURE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "benchmarks",
+    "fixtures",
+    "sozialministerium.html",
+)
+
+
+def page():
+    with open(FIXTURE, encoding="utf-8") as f:
+        return f.read()
+
+
+def test_retrieve():
+    cases, fatalities, hospitalizations, icus, releases = update_data.retrieve(page())
+    assert cases[0] == ("Bgld.", "6.898")
+    assert cases[-1] == ("Österreich gesamt", "69.001")
+    assert [row[-1][1] for row in (fatalities, hospitalizations, icus, releases)] == [
+        "1.572",
+        "841",
+        "241",
+        "64.444",
+    ]
+    row = update_data.get_row(update_data.FILE_CASES, cases, "2020-11-01")
+    assert row["AT"] == 69001
+    assert row["AT"] == sum(v for k, v in row.items() if k not in ("Date", "AT"))
+
+
+def test_retrieve_matches_full_page_parsing():
+    assert update_data.retrieve(page()) == legacy_retrieve(page())
+
+
+def test_retrieve_without_table_start():
+    # Falls back to parsing the matching elements of the whole page
+    unquoted = page().replace('"table-responsive"', "table-responsive", 1)
+    assert update_data.TABLE_START.search(unquoted.replace("\n", "")) is None
+    assert update_data.retrieve(unquoted) == legacy_retrieve(page())
+
+
+def test_retrieve_districts_matches_full_page_parsing():
+    districts = update_data.retrieve_districts(page())
+    assert districts[:2] == [("Amstetten", "2.032"), ("Baden", "893")]
+    assert len(districts) == 94
+    assert districts == legacy_retrieve_districts(page())
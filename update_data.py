@@ -1,10 +1,22 @@
 # -*- coding: utf-8 -*-
+import hashlib
+import html
+import json
 import os
+import re
 import bs4
-import pandas as pd
 from urllib import request
+from urllib.error import HTTPError
 from datetime import date
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+from dashcoch import transaction
+from dashcoch.districts import DISTRICTS
+
+try:
+    import lxml
+    PARSER = 'lxml'
+except ImportError:
+    PARSER = 'html.parser'
 
 
 URL = 'https://www.sozialministerium.at/Informationen-zum-Coronavirus/Neuartiges-Coronavirus-(2019-nCov).html'
@@ -20,113 +32,82 @@ STATES = {
     'W': 'W',
     'Österreich gesamt': 'AT'
 }
-DISTRICTS = {
-    'Amstetten': 'NÖ',
-    'Baden': 'NÖ',
-    'Bludenz': 'V',
-    'Braunau am Inn': 'OÖ',
-    'Bregenz': 'V',
-    'Bruck an der Leitha': 'NÖ',
-    'Bruck-Mürzzuschlag': 'ST',
-    'Deutschlandsberg': 'ST',
-    'Dornbirn': 'V',
-    'Eferding': 'OÖ',
-    'Eisenstadt(Stadt)': 'B',
-    'Eisenstadt-Umgebung': 'B',
-    'Feldkirch': 'V',
-    'Feldkirchen': 'K',
-    'Freistadt': 'OÖ',
-    'Gänserndorf': 'NÖ',
-    'Gmünd': 'NÖ',
-    'Gmunden': 'OÖ',
-    'Graz(Stadt)': 'ST',
-    'Graz-Umgebung': 'ST',
-    'Grieskirchen': 'OÖ',
-    'Gröbming': 'ST',
-    'Güssing': 'B',
-    'Hallein': 'S',
-    'Hartberg-Fürstenfeld': 'ST',
-    'Hermagor': 'K',
-    'Hollabrunn': 'NÖ',
-    'Horn': 'NÖ',
-    'Imst': 'T',
-    'Innsbruck-Land': 'T',
-    'Innsbruck-Stadt': 'T',
-    'Jennersdorf': 'B',
-    'Kirchdorf an der Krems': 'OÖ',
-    'Kitzbühel': 'T',
-    'Klagenfurt Land': 'K',
-    'Klagenfurt Stadt': 'K',
-    'Korneuburg': 'NÖ',
-    'Krems an der Donau(Stadt)': 'NÖ',
-    'Krems(Land)': 'NÖ',
-    'Kufstein': 'T',
-    'Landeck': 'T',
-    'Leibnitz': 'ST',
-    'Leoben': 'ST',
-    'Lienz': 'T',
-    'Liezen': 'ST',
-    'Lilienfeld': 'NÖ',
-    'Linz(Stadt)': 'OÖ',
-    'Linz-Land': 'OÖ',
-    'Mattersburg': 'B',
-    'Melk': 'NÖ',
-    'Mistelbach': 'NÖ',
-    'Mödling': 'NÖ',
-    'Murau': 'ST',
-    'Murtal': 'ST',
-    'Neunkirchen': 'NÖ',
-    'Neusiedl am See': 'B',
-    'Oberpullendorf': 'B',
-    'Oberwart': 'B',
-    'Perg': 'OÖ',
-    'Reutte': 'T',
-    'Ried im Innkreis': 'OÖ',
-    'Rohrbach': 'B',
-    'Salzburg(Stadt)': 'S',
-    'Salzburg-Umgebung': 'S',
-    'Sankt Johann im Pongau': 'S',
-    'Sankt Pölten(Land)': 'NÖ',
-    'Sankt Pölten(Stadt)': 'NÖ',
-    'Sankt Veit an der Glan': 'K',
-    'Schärding': 'OÖ',
-    'Scheibbs': 'NÖ',
-    'Schwaz': 'T',
-    'Spittal an der Drau': 'K',
-    'Steyr(Stadt)': 'OÖ',
-    'Steyr-Land': 'OÖ',
-    'Südoststeiermark': 'ST',
-    'Tamsweg': 'S',
-    'Tulln': 'NÖ',
-    'Urfahr-Umgebung': 'OÖ',
-    'Villach Land': 'K',
-    'Villach Stadt': 'K',
-    'Vöcklabruck': 'K',
-    'Voitsberg': 'ST',
-    'Völkermarkt': 'K',
-    'Waidhofen an der Thaya': 'NÖ',
-    'Waidhofen an der Ybbs(Stadt)': 'NÖ',
-    'Weiz': 'ST',
-    'Wels(Stadt)': 'OÖ',
-    'Wels-Land': 'OÖ',
-    'Wien(Stadt)': 'W',
-    'Wiener Neustadt(Land)': 'NÖ',
-    'Wiener Neustadt(Stadt)': 'NÖ',
-    'Wolfsberg': 'K',
-    'Zell am See': 'S',
-    'Zwettl': 'NÖ'
-}
 
 FILE_CASES = 'data_AT/covid19_cases_austria.csv'
 FILE_FATALITIES = 'data_AT/covid19_fatalities_austria.csv'
 FILE_HOSPITALIZATIONS = 'data_AT/covid19_hospitalized_austria.csv'
 FILE_ICUS = 'data_AT/covid19_icu_austria.csv'
 FILE_RELEASES = 'data_AT/covid19_releases_austria.csv'
+FILE_DISTRICT_CASES = 'data_AT/covid19_cases_districts_austria.csv'
+# Validators of the last page that was written to the files
+FILE_SOURCE_STATE = '.cache/update_data.json'
 
+TABLE_START = re.compile(r"""<[^<>]*\bclass=["'][^"']*\btable-responsive\b""")
+DISTRICT_CASES = re.compile(
+    r'(?<![\w-])('
+    + '|'.join(sorted(map(re.escape, DISTRICTS), key=len, reverse=True))
+    + r')\s*\((\d[\d.]*)\)'
+)
 
-def retrieve():
-    r = request.urlopen(URL).read().decode().replace('\n', '').replace('\t', '').replace('&nbsp;', '')
-    soup = BeautifulSoup(r, 'html.parser')
+
+def fetch(url=URL, state_file=FILE_SOURCE_STATE):
+    """Returns the page and its state for save_state, or None if the page
+    did not change since it was written today."""
+    today_str = date.today().strftime('%Y-%m-%d')
+    try:
+        with open(state_file) as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        state = {}
+    if state.get('date') != today_str:
+        # A new day gets its row even if the numbers did not change
+        state = {}
+
+    req = request.Request(url)
+    if 'etag' in state:
+        req.add_header('If-None-Match', state['etag'])
+    if 'last_modified' in state:
+        req.add_header('If-Modified-Since', state['last_modified'])
+    try:
+        response = request.urlopen(req)
+    except HTTPError as e:
+        if e.code == 304:
+            return None
+        raise
+
+    page = response.read().decode()
+    digest = hashlib.sha1(page.encode()).hexdigest()
+    if digest == state.get('sha1'):
+        return None
+    new_state = {'date': today_str, 'sha1': digest}
+    if response.headers.get('ETag'):
+        new_state['etag'] = response.headers['ETag']
+    if response.headers.get('Last-Modified'):
+        new_state['last_modified'] = response.headers['Last-Modified']
+    return page, new_state
+
+
+def save_state(state, state_file=FILE_SOURCE_STATE):
+    os.makedirs(os.path.dirname(state_file), exist_ok=True)
+    with open(state_file + '.tmp', 'w') as f:
+        json.dump(state, f)
+    os.replace(state_file + '.tmp', state_file)
+
+
+def get_table(page):
+    # Only the table is parsed, cut out of the page if its start and end can
+    # be found, otherwise by building the tree of the matching elements only
+    start = TABLE_START.search(page)
+    end = page.find('</table>', start.start()) if start else -1
+    if end < 0:
+        strainer = SoupStrainer(attrs={'class': 'table-responsive'})
+        return BeautifulSoup(page, PARSER, parse_only=strainer)
+    return BeautifulSoup(page[start.start():end + len('</table>')], PARSER)
+
+
+def retrieve(page):
+    r = page.replace('\n', '').replace('\t', '').replace('&nbsp;', '')
+    soup = get_table(r)
     table = soup.find(attrs={'class': 'table-responsive'}).find_next()
     body = table.find('tbody')
     rows = body.find_all('tr')
@@ -151,37 +132,63 @@ def retrieve():
     return cases, fatalities, hospitalizations, icus, releases
 
 
-def append_csv(filename, data):
-    df = pd.read_csv(filename)
+def retrieve_districts(page):
+    # The cases per district are listed as "Amstetten (12), Baden (30), ...",
+    # matched in the text of the page without building its tree
+    text = html.unescape(re.sub(r'<[^>]*>', ' ', page)).replace('\xa0', ' ')
 
+    found = {}
+    for match in DISTRICT_CASES.finditer(text):
+        found.setdefault(match.group(1), match.group(2))
+    return [(district, found[district]) for district in DISTRICTS if district in found]
+
+
+def get_row(filename, data, today_str):
     values = {k[1]:0 for k in STATES.items()}
     for d in data: 
         values[STATES[d[0]]] = int(d[1].replace('.', ''))
 
-    today_str = date.today().strftime('%Y-%m-%d')
     sum_at = sum([v for k, v in values.items() if k != 'AT'])
     if sum_at != values['AT']:
         print('Sum differs from numbers online for {} at {}'.format(os.path.basename(filename), today_str))
 
-    values['Date'] = today_str
+    return {'Date': today_str, **values}
 
-    if today_str in df['Date'].to_list():
-        df.update([values])
-    else:
-        df = df.append([values])
-    df['Date'] = pd.to_datetime(df['Date'])
-    df = df.set_index('Date')
-    df.sort_index(inplace=True)
-    df.to_csv(filename)
+
+def get_district_row(data, today_str):
+    values = {k: 0 for k in DISTRICTS}
+    for d in data:
+        values[d[0]] = int(d[1].replace('.', ''))
+
+    return {'Date': today_str, **values}
 
 
 def update_data():
-    cases, fatalities, hospitalizations, icus, releases = retrieve()
-    append_csv(FILE_CASES, cases)
-    append_csv(FILE_FATALITIES, fatalities)
-    append_csv(FILE_HOSPITALIZATIONS, hospitalizations)
-    append_csv(FILE_ICUS, icus)
-    append_csv(FILE_RELEASES, releases)
+    fetched = fetch()
+    if fetched is None:
+        print('The page did not change since the last update')
+        return
+    page, state = fetched
+    cases, fatalities, hospitalizations, icus, releases = retrieve(page)
+    districts = retrieve_districts(page)
+
+    today_str = date.today().strftime('%Y-%m-%d')
+    rows = {
+        FILE_CASES: get_row(FILE_CASES, cases, today_str),
+        FILE_FATALITIES: get_row(FILE_FATALITIES, fatalities, today_str),
+        FILE_HOSPITALIZATIONS: get_row(FILE_HOSPITALIZATIONS, hospitalizations, today_str),
+        FILE_ICUS: get_row(FILE_ICUS, icus, today_str),
+        FILE_RELEASES: get_row(FILE_RELEASES, releases, today_str),
+    }
+    if districts:
+        rows[FILE_DISTRICT_CASES] = get_district_row(districts, today_str)
+    else:
+        print('No cases per district found')
+
+    # All files and their binary copies are replaced together, so the
+    # dashboard never loads some of them updated and others not
+    transaction.commit(rows)
+    save_state(state)
 
 
 if __name__ == "__main__":